@@ -1,54 +1,56 @@
 """
 Alembic Environment Configuration
-Professional database migration setup with async support
+Professional database migration setup
 """
 from logging.config import fileConfig
-from sqlalchemy import pool
+from sqlalchemy import create_engine, pool
 from alembic import context
+import os
 import sys
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-# Import app configuration and models
-from app.core.config import settings
-from app.models.base import Base
-
-# Import ALL models
-from app.models import (
-    User,
-    Conversation,
-    ConversationParticipant,
-    Message,
-    MessageReaction,
-    Friendship
-)
-
 # Alembic Config object
 config = context.config
 
-# Set database URL from settings
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
-
 # Interpret config file for Python logging
-if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+if config.config_file_name is not None and not os.getenv("ALEMBIC_SKIP_LOGCONFIG"):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
-# Set target metadata for autogenerate support
-target_metadata = Base.metadata
+# Server default comparison reflects every column; only do it when
+# autogenerating (ALEMBIC_AUTOGENERATE=1), not on plain upgrade runs
+COMPARE_SERVER_DEFAULT = os.getenv("ALEMBIC_AUTOGENERATE") == "1"
+
+
+def _load_metadata():
+    """
+    Import app settings and models on demand.
+    
+    Loading settings pulls in .env and validators, so it is deferred until
+    a command actually needs the database or the target metadata.
+    """
+    from app.core.config import settings
+    from app.models.base import Base
+    import app.models  # noqa: F401 - registers every mapper on Base.metadata
+    
+    # Set database URL from settings
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+    
+    return settings, Base.metadata
 
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
-    url = settings.DATABASE_URL
+    settings, target_metadata = _load_metadata()
     context.configure(
-        url=url,
+        url=settings.DATABASE_URL,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
         compare_type=True,
-        compare_server_default=True,
+        compare_server_default=COMPARE_SERVER_DEFAULT,
     )
 
     with context.begin_transaction():
@@ -57,34 +59,80 @@ def run_migrations_offline() -> None:
 
 def do_run_migrations(connection):
     """Execute migrations with connection"""
+    _, target_metadata = _load_metadata()
     context.configure(
         connection=connection,
         target_metadata=target_metadata,
+        # Commit after each revision so a migration's autocommit_block()
+        # (CONCURRENTLY index builds) never sits inside a multi-revision
+        # transaction
+        transaction_per_migration=True,
         compare_type=True,
-        compare_server_default=True,
+        compare_server_default=COMPARE_SERVER_DEFAULT,
     )
 
     with context.begin_transaction():
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode with async support."""
-    import asyncio
-    from sqlalchemy.ext.asyncio import create_async_engine
+def get_sync_url(database_url: str) -> str:
+    """Derive a synchronous driver URL from the async application URL."""
+    return database_url.replace("+asyncpg", "")
+
+
+def run_migrations_with_connection(connection) -> None:
+    """
+    Run migrations on a connection supplied by the caller.
+    
+    The connection must be synchronous (psycopg2, see get_sync_url), since
+    asyncpg rejects the multi-statement scripts some revisions send. It must
+    also not be inside a transaction, or autocommit_block() (CONCURRENTLY
+    index builds) fails.
     
-    async def run_async_migrations():
-        connectable = create_async_engine(
-            settings.DATABASE_URL,
-            poolclass=pool.NullPool,
+    Usage from application code:
+        engine = create_engine(get_sync_url(settings.DATABASE_URL), poolclass=pool.NullPool)
+        with engine.connect() as conn:
+            alembic_cfg.attributes["connection"] = conn
+            command.upgrade(alembic_cfg, "head")
+    """
+    if connection.dialect.driver == "asyncpg":
+        raise ValueError(
+            "Migrations need a synchronous psycopg2 connection; "
+            "create one from get_sync_url(DATABASE_URL)"
         )
+    if connection.in_transaction():
+        raise ValueError(
+            "Migrations need a connection outside a transaction; "
+            "use engine.connect() instead of engine.begin()"
+        )
+    do_run_migrations(connection)
 
-        async with connectable.connect() as connection:
-            await connection.run_sync(do_run_migrations)
 
-        await connectable.dispose()
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    Migrations are serial DDL, so a plain synchronous engine is used
+    instead of routing every statement through the async greenlet layer.
+    """
+    # Reuse a connection handed in by the application instead of opening one
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations_with_connection(connection)
+        return
     
-    asyncio.run(run_async_migrations())
+    settings, _ = _load_metadata()
+    
+    # A migration run needs exactly one connection and the engine is
+    # disposed afterwards, so there is nothing for a pool to keep
+    connectable = create_engine(
+        get_sync_url(settings.DATABASE_URL),
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        do_run_migrations(connection)
+
+    connectable.dispose()
 
 
 # Run migrations based on context
@@ -0,0 +1,37 @@
+"""add_participant_user_index
+
+Revision ID: 3f1c2a9b7d4e
+Revises: 59737e37e48d
+Create Date: 2026-10-16 09:12:41.518204
+
+The (conversation_id, user_id) side is already covered by the primary key
+of conversation_participants. This adds the reverse (user_id,
+conversation_id) order used by "conversations of user X" lookups, built
+CONCURRENTLY so participant writes are not blocked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d4e'
+down_revision: Union[str, None] = '59737e37e48d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add (user_id, conversation_id) index to conversation_participants."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_participants_user_conversation "
+            "ON conversation_participants (user_id, conversation_id)"
+        )
+
+
+def downgrade() -> None:
+    """Remove (user_id, conversation_id) index from conversation_participants."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_participants_user_conversation")
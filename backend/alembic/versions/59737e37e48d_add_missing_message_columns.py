@@ -4,6 +4,11 @@ Revision ID: 59737e37e48d
 Revises: 
 Create Date: 2025-11-21 01:47:55.806092
 
+All added columns use constant defaults (NULL / 'false'), so on PostgreSQL 11+
+the ALTER TABLE is a catalog-only change: no table rewrite, and the
+ACCESS EXCLUSIVE lock on messages is held for milliseconds regardless of
+row count. The only step that scales with table size is the index build,
+which runs CONCURRENTLY.
 """
 from typing import Sequence, Union
 
@@ -21,56 +26,56 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     """Add missing columns to messages table."""
-    # Add edited_at column
-    op.add_column('messages', 
-        sa.Column('edited_at', sa.DateTime(timezone=True), nullable=True)
-    )
+    # Transactional DDL is sent as one script (one round-trip):
+    # - fail fast instead of queueing behind chat traffic for the table lock
+    #   (LOCAL: the timeouts end with this transaction and do not apply to
+    #   the concurrent index builds below)
+    # - make sure server-side gen_random_uuid() is available (idempotent)
+    # - add all new columns and the read_by_user_id foreign key in a single
+    #   ALTER TABLE so the table lock is taken once for the whole change
+    op.execute(sa.text(
+        "SET LOCAL lock_timeout = '2s'; "
+        "SET LOCAL statement_timeout = '5min'; "
+        "CREATE EXTENSION IF NOT EXISTS pgcrypto; "
+        "ALTER TABLE messages "
+        "ADD COLUMN edited_at TIMESTAMPTZ NULL DEFAULT NULL, "
+        "ADD COLUMN is_deleted VARCHAR(10) NOT NULL DEFAULT 'false', "
+        "ADD COLUMN delivered_at TIMESTAMPTZ NULL DEFAULT NULL, "
+        "ADD COLUMN read_at TIMESTAMPTZ NULL DEFAULT NULL, "
+        "ADD COLUMN read_by_user_id UUID NULL, "
+        "ADD CONSTRAINT fk_messages_read_by_user_id "
+        "FOREIGN KEY (read_by_user_id) REFERENCES users (id) ON DELETE SET NULL NOT VALID"
+    ))
     
-    # Add is_deleted column
-    op.add_column('messages', 
-        sa.Column('is_deleted', sa.String(10), nullable=False, server_default='false')
-    )
-    
-    # Add delivered_at column
-    op.add_column('messages', 
-        sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True)
-    )
-    
-    # Add read_at column
-    op.add_column('messages', 
-        sa.Column('read_at', sa.DateTime(timezone=True), nullable=True)
-    )
-    
-    # Add read_by_user_id column with foreign key
-    op.add_column('messages', 
-        sa.Column('read_by_user_id', postgresql.UUID(as_uuid=True), nullable=True)
-    )
-    op.create_foreign_key(
-        'fk_messages_read_by_user_id',
-        'messages', 'users',
-        ['read_by_user_id'], ['id'],
-        ondelete='SET NULL'
-    )
-    
-    # Create index on read_by_user_id for better query performance
-    op.create_index(
-        'idx_messages_read_by_user_id',
-        'messages',
-        ['read_by_user_id']
-    )
+    # Statements below run outside the migration transaction so they do
+    # not extend the ALTER TABLE lock; CONCURRENTLY requires this anyway.
+    with op.get_context().autocommit_block():
+        # The FK was added NOT VALID to skip the scan under the ALTER TABLE
+        # lock; validating afterwards only takes SHARE UPDATE EXCLUSIVE
+        op.execute("ALTER TABLE messages VALIDATE CONSTRAINT fk_messages_read_by_user_id")
+        
+        # Index on read_by_user_id for better query performance.
+        # CONCURRENTLY keeps the table writable while the index builds.
+        # (d1f5a7c3e206 later narrows it to read-tracked rows.)
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_read_by_user_id "
+            "ON messages (read_by_user_id)"
+        )
 
 
 def downgrade() -> None:
     """Remove added columns from messages table."""
-    # Drop index
-    op.drop_index('idx_messages_read_by_user_id', table_name='messages')
-    
-    # Drop foreign key
-    op.drop_constraint('fk_messages_read_by_user_id', 'messages', type_='foreignkey')
+    # Drop index without blocking writes
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_read_by_user_id")
     
-    # Drop columns in reverse order
-    op.drop_column('messages', 'read_by_user_id')
-    op.drop_column('messages', 'read_at')
-    op.drop_column('messages', 'delivered_at')
-    op.drop_column('messages', 'is_deleted')
-    op.drop_column('messages', 'edited_at')
+    # Drop foreign key and columns in a single ALTER TABLE
+    op.execute(sa.text(
+        "ALTER TABLE messages "
+        "DROP CONSTRAINT fk_messages_read_by_user_id, "
+        "DROP COLUMN read_by_user_id, "
+        "DROP COLUMN read_at, "
+        "DROP COLUMN delivered_at, "
+        "DROP COLUMN is_deleted, "
+        "DROP COLUMN edited_at"
+    ))
@@ -0,0 +1,35 @@
+"""add_friendship_pair_index
+
+Revision ID: 8b5e0d4c61a2
+Revises: 3f1c2a9b7d4e
+Create Date: 2026-10-16 10:03:17.204551
+
+Expression index on the unordered user pair so "are A and B friends"
+checks are a single index probe in either direction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b5e0d4c61a2'
+down_revision: Union[str, None] = '3f1c2a9b7d4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add (LEAST, GREATEST) pair index to friendships."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_friendships_pair "
+            "ON friendships (LEAST(user_id, friend_id), GREATEST(user_id, friend_id))"
+        )
+
+
+def downgrade() -> None:
+    """Remove pair index from friendships."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_friendships_pair")
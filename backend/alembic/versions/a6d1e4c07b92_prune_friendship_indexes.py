@@ -0,0 +1,62 @@
+"""prune_friendship_indexes
+
+Revision ID: a6d1e4c07b92
+Revises: f3b9d2a6c814
+Create Date: 2026-10-16 17:31:09.552870
+
+The (user_id, status) and (friend_id, status) composite indexes and the
+unique (user_id, friend_id) constraint already serve every friendship
+lookup; they are (re)created here only if missing. The single-column
+user_id / friend_id indexes are prefixes of the composites, the status
+index is never used on its own, and idx_friendships_user_friend duplicates
+the unique constraint, so they only cost writes and are dropped. Names
+differ between create_all (ix_*) and database/archive (idx_*), so both
+spellings are handled.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d1e4c07b92'
+down_revision: Union[str, None] = 'f3b9d2a6c814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+REDUNDANT_INDEXES = (
+    "ix_friendships_user_id",
+    "ix_friendships_friend_id",
+    "ix_friendships_status",
+    "idx_friendships_user_id",
+    "idx_friendships_friend_id",
+    "idx_friendships_status",
+    "idx_friendships_user_friend",
+)
+
+
+def upgrade() -> None:
+    """Ensure the composite friendship indexes exist and drop redundant ones."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_friendships_user_status "
+            "ON friendships (user_id, status)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_friendships_friend_status "
+            "ON friendships (friend_id, status)"
+        )
+        for name in REDUNDANT_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    """Restore the single-column friendship indexes."""
+    with op.get_context().autocommit_block():
+        for column in ("user_id", "friend_id", "status"):
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friendships_{column} "
+                f"ON friendships ({column})"
+            )
@@ -0,0 +1,79 @@
+"""messages_is_deleted_boolean
+
+Revision ID: b8e2f4a1c937
+Revises: a6d1e4c07b92
+Create Date: 2026-10-16 19:04:27.183526
+
+Converts messages.is_deleted from the original VARCHAR(10) 'true'/'false'
+flag to a native BOOLEAN and replaces the plain is_deleted index with a
+partial index over live messages. The type change rewrites the table under
+an ACCESS EXCLUSIVE lock, so it is skipped on databases where the column is
+already BOOLEAN (e.g. bootstrapped from database/add_message_management.sql).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2f4a1c937'
+down_revision: Union[str, None] = 'a6d1e4c07b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Convert messages.is_deleted to BOOLEAN and index live messages."""
+    # Fail fast instead of queueing behind chat traffic for the table lock.
+    # The default has to be dropped first: 'false'::varchar cannot be cast
+    # to the new type automatically.
+    op.execute(sa.text(
+        "SET LOCAL lock_timeout = '2s'; "
+        "DO $$ BEGIN "
+        "IF (SELECT data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() "
+        "AND table_name = 'messages' AND column_name = 'is_deleted') <> 'boolean' THEN "
+        "ALTER TABLE messages "
+        "ALTER COLUMN is_deleted DROP DEFAULT, "
+        "ALTER COLUMN is_deleted TYPE boolean USING is_deleted = 'true', "
+        "ALTER COLUMN is_deleted SET DEFAULT false; "
+        "END IF; "
+        "END $$"
+    ))
+
+    # Index changes run outside the migration transaction so they do not
+    # extend the ALTER TABLE lock; CONCURRENTLY requires this anyway.
+    with op.get_context().autocommit_block():
+        # Low-cardinality index from database/add_message_management.sql,
+        # superseded by the partial index below
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_is_deleted")
+
+        # Partial index for listing non-deleted messages; stays small since
+        # soft-deleted rows are excluded
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_active "
+            "ON messages (conversation_id, created_at DESC) "
+            "WHERE is_deleted = false"
+        )
+
+
+def downgrade() -> None:
+    """Convert messages.is_deleted back to VARCHAR(10)."""
+    # The partial index predicate depends on the BOOLEAN type
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_active")
+
+    op.execute(sa.text(
+        "ALTER TABLE messages "
+        "ALTER COLUMN is_deleted DROP DEFAULT, "
+        "ALTER COLUMN is_deleted TYPE VARCHAR(10) "
+        "USING CASE WHEN is_deleted THEN 'true' ELSE 'false' END, "
+        "ALTER COLUMN is_deleted SET DEFAULT 'false'"
+    ))
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_is_deleted "
+            "ON messages (is_deleted)"
+        )
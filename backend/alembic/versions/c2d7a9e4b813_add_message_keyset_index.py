@@ -0,0 +1,41 @@
+"""add_message_keyset_index
+
+Revision ID: c2d7a9e4b813
+Revises: 8b5e0d4c61a2
+Create Date: 2026-10-16 11:42:08.615230
+
+Adds id as a tie-breaker to the (conversation_id, created_at DESC) index so
+keyset paging on (created_at, id) is a single index range scan. The new
+index covers every query the old one served, so the old one is dropped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d7a9e4b813'
+down_revision: Union[str, None] = '8b5e0d4c61a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Replace conversation/created_at index with a (created_at, id) keyset index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_conversation_created_id "
+            "ON messages (conversation_id, created_at DESC, id DESC)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_conversation_created")
+
+
+def downgrade() -> None:
+    """Restore the conversation/created_at index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_conversation_created "
+            "ON messages (conversation_id, created_at DESC)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_conversation_created_id")
@@ -0,0 +1,52 @@
+"""partial_read_by_user_index
+
+Revision ID: d1f5a7c3e206
+Revises: b8e2f4a1c937
+Create Date: 2026-10-16 19:26:53.940718
+
+Most messages are never read-tracked, so the plain read_by_user_id index
+is mostly NULL entries. It is rebuilt as a partial index over tracked rows
+with read_at included for index-only scans. The replacement is built
+CONCURRENTLY under a temporary name before the old index is dropped, so
+read-receipt lookups are never left without an index.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f5a7c3e206'
+down_revision: Union[str, None] = 'b8e2f4a1c937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Replace the read_by_user_id index with a partial covering index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_read_by_user_id_new "
+            "ON messages (read_by_user_id) INCLUDE (read_at) "
+            "WHERE read_by_user_id IS NOT NULL"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_read_by_user_id")
+        op.execute(
+            "ALTER INDEX idx_messages_read_by_user_id_new "
+            "RENAME TO idx_messages_read_by_user_id"
+        )
+
+
+def downgrade() -> None:
+    """Restore the plain read_by_user_id index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_read_by_user_id_old "
+            "ON messages (read_by_user_id)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_messages_read_by_user_id")
+        op.execute(
+            "ALTER INDEX idx_messages_read_by_user_id_old "
+            "RENAME TO idx_messages_read_by_user_id"
+        )
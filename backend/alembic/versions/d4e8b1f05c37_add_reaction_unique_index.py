@@ -0,0 +1,64 @@
+"""add_reaction_unique_index
+
+Revision ID: d4e8b1f05c37
+Revises: c2d7a9e4b813
+Create Date: 2026-10-16 14:08:51.392716
+
+add_reaction upserts with ON CONFLICT (message_id, user_id, emoji), which
+needs a unique index on those columns. Tables created from
+database/add_message_reactions.sql already have one; tables created by
+create_all from the old model do not.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8b1f05c37'
+down_revision: Union[str, None] = 'c2d7a9e4b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_unique_reaction_key(bind) -> bool:
+    """Check for any unique index on exactly (message_id, user_id, emoji)."""
+    return bind.execute(sa.text(
+        "SELECT EXISTS ("
+        "  SELECT 1 FROM pg_index i"
+        "  WHERE i.indrelid = 'message_reactions'::regclass"
+        "    AND i.indisunique"
+        "    AND (SELECT array_agg(a.attname::text ORDER BY a.attname)"
+        "         FROM pg_attribute a"
+        "         WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey))"
+        "        = ARRAY['emoji', 'message_id', 'user_id']"
+        ")"
+    )).scalar()
+
+
+def upgrade() -> None:
+    """Add unique (message_id, user_id, emoji) index to message_reactions if missing."""
+    if _has_unique_reaction_key(op.get_bind()):
+        return
+    
+    # Drop duplicate reactions (keep the earliest) so the unique index can build
+    op.execute(
+        "DELETE FROM message_reactions r "
+        "USING message_reactions d "
+        "WHERE r.message_id = d.message_id AND r.user_id = d.user_id "
+        "AND r.emoji = d.emoji "
+        "AND (r.created_at, r.id) > (d.created_at, d.id)"
+    )
+    
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_reactions_message_user_emoji "
+            "ON message_reactions (message_id, user_id, emoji)"
+        )
+
+
+def downgrade() -> None:
+    """Remove the unique index added by this revision."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_reactions_message_user_emoji")
@@ -0,0 +1,58 @@
+"""add_reaction_covering_index
+
+Revision ID: e7a3c5f92d10
+Revises: d4e8b1f05c37
+Create Date: 2026-10-16 16:21:37.204583
+
+get_message_reactions aggregates emoji, user_id and created_at for one
+message. A (message_id) index INCLUDE-ing those columns serves it with an
+index-only scan. It replaces the plain message_id index, and the emoji-only
+index is dropped since no query filters on emoji without message_id
+(the unique (message_id, user_id, emoji) index covers those lookups).
+Index names differ between database/add_message_reactions.sql and
+create_all, so both spellings are handled.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c5f92d10'
+down_revision: Union[str, None] = 'd4e8b1f05c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+REDUNDANT_INDEXES = (
+    "idx_reactions_message_id",
+    "ix_message_reactions_message_id",
+    "idx_reactions_emoji",
+    "ix_message_reactions_emoji",
+)
+
+
+def upgrade() -> None:
+    """Replace message_id/emoji reaction indexes with a covering message_id index."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reactions_message_covering "
+            "ON message_reactions (message_id) INCLUDE (emoji, user_id, created_at)"
+        )
+        for name in REDUNDANT_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    """Restore the plain message_id and emoji indexes."""
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reactions_message_id "
+            "ON message_reactions (message_id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reactions_emoji "
+            "ON message_reactions (emoji)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_reactions_message_covering")
@@ -0,0 +1,60 @@
+"""friendship_status_enum
+
+Revision ID: f3b9d2a6c814
+Revises: e7a3c5f92d10
+Create Date: 2026-10-16 17:05:42.918306
+
+Converts friendships.status from VARCHAR(20) to a native friendship_status
+ENUM. Enum values compare and index as 4-byte OIDs and reject unknown
+statuses on their own, so the CHECK constraint is dropped (it is named
+check_valid_status when created from the model, friendships_status_check
+when created from database/archive).
+
+The type change rewrites the table and its status indexes under an ACCESS
+EXCLUSIVE lock; friendships is small enough for that to be brief.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2a6c814'
+down_revision: Union[str, None] = 'e7a3c5f92d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+friendship_status = postgresql.ENUM(
+    'pending', 'accepted', 'rejected', 'blocked',
+    name='friendship_status'
+)
+
+
+def upgrade() -> None:
+    """Convert friendships.status to the friendship_status enum."""
+    friendship_status.create(op.get_bind(), checkfirst=True)
+    
+    op.execute("ALTER TABLE friendships DROP CONSTRAINT IF EXISTS check_valid_status")
+    op.execute("ALTER TABLE friendships DROP CONSTRAINT IF EXISTS friendships_status_check")
+    op.execute("ALTER TABLE friendships ALTER COLUMN status DROP DEFAULT")
+    op.execute(
+        "ALTER TABLE friendships ALTER COLUMN status TYPE friendship_status "
+        "USING status::friendship_status"
+    )
+    op.execute("ALTER TABLE friendships ALTER COLUMN status SET DEFAULT 'pending'")
+
+
+def downgrade() -> None:
+    """Convert friendships.status back to VARCHAR with a CHECK constraint."""
+    op.execute("ALTER TABLE friendships ALTER COLUMN status DROP DEFAULT")
+    op.execute("ALTER TABLE friendships ALTER COLUMN status TYPE VARCHAR(20) USING status::text")
+    op.execute("ALTER TABLE friendships ALTER COLUMN status SET DEFAULT 'pending'")
+    op.create_check_constraint(
+        "check_valid_status",
+        "friendships",
+        "status IN ('pending', 'accepted', 'rejected', 'blocked')"
+    )
+    friendship_status.drop(op.get_bind(), checkfirst=True)
@@ -1,11 +1,13 @@
 """
 Conversation endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func
-from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy import select, insert, delete, and_, or_, func, exists
+from sqlalchemy.orm import selectinload, raiseload, aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
 from ...database import get_db
@@ -20,14 +22,27 @@ from ...schemas.conversation import (
     ConversationType as ConversationTypeSchema
 )
 from ...core.deps import get_current_active_user
-from ...models.friendship import Friendship
+from ...core.cache import (
+    cache_delete,
+    cache_incr,
+    cache_srem,
+    conversation_members_key,
+    conversation_members_version_key,
+    friend_list_keys,
+    CONVERSATION_MEMBERS_TTL_SECONDS,
+    user_conversations_key,
+    user_conversations_version_key,
+    USER_CONVERSATIONS_TTL_SECONDS
+)
+from ...models.friendship import Friendship, FriendshipState
 from ...websocket.manager import manager
-from ...schemas.websocket import WSMessage, WSMessageType, WSChatMessage
-from datetime import datetime
+from ...schemas.websocket import WSMessage, WSMessageType
 from pydantic import BaseModel
 from typing import List as ListType
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class AddParticipantsBatchRequest(BaseModel):
@@ -35,34 +50,201 @@ class AddParticipantsBatchRequest(BaseModel):
     user_ids: ListType[UUID]
 
 
-def _build_conversation_response(conversation: Conversation) -> ConversationResponse:
-    """Helper function to build ConversationResponse with participant details"""
-    participants_response = [
-        ConversationParticipantResponse(
-            user_id=p.user.id,
-            username=p.user.username,
-            display_name=p.user.display_name,
-            joined_at=p.joined_at
+async def _get_conversation_summaries(
+    db: AsyncSession,
+    conversation_ids: List[UUID],
+    user_id: UUID
+) -> Tuple[Dict[UUID, str], Dict[UUID, int]]:
+    """
+    Load last message content and unread count for a page of conversations
+    
+    Uses one DISTINCT ON query and one GROUP BY query for the whole page.
+    Unread messages are those from other users (or system) created after the
+    user's last_read_message.
+    
+    Returns:
+        (last_messages, unread_counts) keyed by conversation id
+    """
+    if not conversation_ids:
+        return {}, {}
+    
+    result = await db.execute(
+        select(Message.conversation_id, Message.content)
+        .where(Message.conversation_id.in_(conversation_ids))
+        .distinct(Message.conversation_id)
+        .order_by(Message.conversation_id, Message.created_at.desc())
+    )
+    last_messages = dict(result.all())
+    
+    last_read = aliased(Message)
+    result = await db.execute(
+        select(Message.conversation_id, func.count(Message.id))
+        .join(
+            ConversationParticipant,
+            and_(
+                ConversationParticipant.conversation_id == Message.conversation_id,
+                ConversationParticipant.user_id == user_id
+            )
         )
-        for p in conversation.participants
-    ]
+        .outerjoin(last_read, last_read.id == ConversationParticipant.last_read_message_id)
+        .where(
+            Message.conversation_id.in_(conversation_ids),
+            Message.sender_id.is_distinct_from(user_id),
+            Message.is_deleted.is_(False),
+            or_(last_read.id.is_(None), Message.created_at > last_read.created_at)
+        )
+        .group_by(Message.conversation_id)
+    )
+    unread_counts = dict(result.all())
     
-    return ConversationResponse(
+    return last_messages, unread_counts
+
+
+def _build_conversation_response(
+    conversation: Conversation,
+    participants_response: List[ConversationParticipantResponse] = None,
+    last_message: Optional[str] = None,
+    unread_count: int = 0
+) -> ConversationResponse:
+    """
+    Helper function to build ConversationResponse with participant details
+    
+    Participants are read from conversation.participants (must be loaded with
+    their users) unless participants_response is given. Data comes straight
+    from the database, so models are built with model_construct (no
+    validation pass).
+    """
+    if participants_response is None:
+        participants_response = [
+            ConversationParticipantResponse.model_construct(
+                user_id=p.user.id,
+                username=p.user.username,
+                display_name=p.user.display_name,
+                joined_at=p.joined_at
+            )
+            for p in conversation.participants
+        ]
+    
+    return ConversationResponse.model_construct(
         id=conversation.id,
-        type=conversation.type.value,
+        type=ConversationTypeSchema(conversation.type.value),
         title=conversation.title,
         created_by=conversation.created_by,
         created_at=conversation.created_at,
         updated_at=conversation.updated_at,
         participants=participants_response,
-        last_message=None,
-        unread_count=0
+        last_message=last_message,
+        unread_count=unread_count
+    )
+
+
+async def _insert_system_message(db: AsyncSession, conversation_id: UUID, content: str):
+    """
+    Insert a system message through the Core table (no ORM object)
+    
+    Returns:
+        Row with id, conversation_id, content and created_at
+    """
+    messages = Message.__table__
+    result = await db.execute(
+        insert(messages)
+        .values(
+            conversation_id=conversation_id,
+            sender_id=None,  # System message has no sender
+            content=content,
+            file_type="system"  # Mark as system message
+        )
+        .returning(messages.c.id, messages.c.conversation_id, messages.c.content, messages.c.created_at)
+    )
+    return result.one()
+
+
+def _system_message_event(message) -> WSMessage:
+    """
+    Build the NEW_MESSAGE event for a server-generated system message
+    
+    Accepts a Message or a row from _insert_system_message.
+    
+    The fields are server-controlled, so the event is built with
+    model_construct and a plain data dict instead of validating WSChatMessage.
+    """
+    return WSMessage.model_construct(
+        type=WSMessageType.NEW_MESSAGE,
+        data={
+            "conversation_id": message.conversation_id,
+            "message_id": message.id,
+            "sender_id": None,
+            "sender_username": "System",
+            "sender_display_name": "System",
+            "content": message.content,
+            "message_type": "system",
+            "file_url": None,
+            "created_at": message.created_at
+        }
+    )
+
+
+async def _forget_user_conversations(user_ids: List[UUID]):
+    """
+    Drop cached conversation id sets of users whose membership changed,
+    bumping their versions first so in-flight write-backs are rejected
+    """
+    await cache_incr(
+        *(user_conversations_version_key(user_id) for user_id in user_ids),
+        ttl=USER_CONVERSATIONS_TTL_SECONDS
+    )
+    await cache_delete(*(user_conversations_key(user_id) for user_id in user_ids))
+
+
+async def _forget_conversation_members(conversation_id: UUID, *user_ids: UUID):
+    """
+    Drop users (or, with none given, everyone) from a conversation's cached
+    member set, bumping its version first so in-flight write-backs are rejected
+    """
+    await cache_incr(
+        conversation_members_version_key(conversation_id),
+        ttl=CONVERSATION_MEMBERS_TTL_SECONDS
     )
+    if user_ids:
+        await cache_srem(
+            conversation_members_key(conversation_id),
+            *(str(user_id) for user_id in user_ids)
+        )
+    else:
+        await cache_delete(conversation_members_key(conversation_id))
+
+
+async def _broadcast_new_conversation(message: WSMessage, user_ids: List[UUID], conversation_id: UUID):
+    """Background task: send NEW_CONVERSATION to all participants"""
+    sent = await manager.broadcast_to_users(message, user_ids)
+    logger.info(
+        "NEW_CONVERSATION broadcast cid=%s n=%d failed=%d",
+        conversation_id, len(user_ids), len(user_ids) - sent
+    )
+
+
+async def _notify_participants_added(
+    conversation_id: UUID,
+    system_message: WSMessage,
+    new_conversation_message: WSMessage,
+    added_user_ids: List[UUID]
+):
+    """
+    Background task: announce added members to the group, then send them the
+    conversation and register them for live updates
+    
+    Registration happens last so new members do not also receive the system
+    message meant for existing participants.
+    """
+    await manager.broadcast_to_conversation(system_message, conversation_id)
+    await manager.broadcast_to_users(new_conversation_message, added_user_ids)
+    manager.add_users_to_conversation(added_user_ids, conversation_id)
 
 
 @router.post("/", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation_data: ConversationCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -88,17 +270,21 @@ async def create_conversation(
         other_user_id = conversation_data.participant_ids[0]
         
         # Find existing direct conversation between these 2 users
+        # (one primary-key probe per user instead of GROUP BY/HAVING)
         result = await db.execute(
-            select(Conversation)
-            .join(ConversationParticipant, Conversation.id == ConversationParticipant.conversation_id)
+            select(Conversation.id)
             .where(
-                and_(
-                    Conversation.type == ConversationType.direct,
-                    ConversationParticipant.user_id.in_([current_user.id, other_user_id])
+                Conversation.type == ConversationType.direct,
+                exists().where(
+                    ConversationParticipant.conversation_id == Conversation.id,
+                    ConversationParticipant.user_id == current_user.id
+                ),
+                exists().where(
+                    ConversationParticipant.conversation_id == Conversation.id,
+                    ConversationParticipant.user_id == other_user_id
                 )
             )
-            .group_by(Conversation.id)
-            .having(func.count(ConversationParticipant.user_id) == 2)
+            .limit(1)
         )
         existing_conv = result.scalar_one_or_none()
         
@@ -117,7 +303,9 @@ async def create_conversation(
     
     # Verify all participants exist
     result = await db.execute(
-        select(User).where(User.id.in_(conversation_data.participant_ids))
+        select(User)
+        .options(raiseload("*"))
+        .where(User.id.in_(conversation_data.participant_ids))
     )
     participants = result.scalars().all()
     
@@ -134,80 +322,64 @@ async def create_conversation(
         created_by=current_user.id
     )
     db.add(new_conversation)
+    # Sessions run with autoflush=False, so the conversation row must be
+    # written before the Core participant INSERT below references it
     await db.flush()
     
-    # Add creator as participant
-    creator_participant = ConversationParticipant(
-        conversation_id=new_conversation.id,
-        user_id=current_user.id
+    # Add creator and other participants in one multi-row INSERT
+    await db.execute(
+        insert(ConversationParticipant),
+        [
+            {"conversation_id": new_conversation.id, "user_id": participant_id}
+            for participant_id in [current_user.id, *conversation_data.participant_ids]
+        ]
     )
-    db.add(creator_participant)
-    
-    # Add other participants
-    for participant_id in conversation_data.participant_ids:
-        participant = ConversationParticipant(
-            conversation_id=new_conversation.id,
-            user_id=participant_id
-        )
-        db.add(participant)
     
     await db.commit()
-    
-    # Reload conversation with participants and user info
-    result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.participants).selectinload(ConversationParticipant.user))
-        .where(Conversation.id == new_conversation.id)
+    await _forget_user_conversations([current_user.id, *conversation_data.participant_ids])
+    
+    # Build the response from data already in hand instead of reloading.
+    # Participant rows were inserted in the same transaction as the
+    # conversation, so their joined_at equals its created_at.
+    conversation = new_conversation
+    conversation_users = [current_user, *participants]
+    
+    conversation_response = _build_conversation_response(
+        conversation,
+        participants_response=[
+            ConversationParticipantResponse.model_construct(
+                user_id=user.id,
+                username=user.username,
+                display_name=user.display_name,
+                joined_at=conversation.created_at
+            )
+            for user in conversation_users
+        ]
     )
-    conversation = result.scalar_one()
-    
-    # Broadcast new conversation event to all participants via WebSocket
-    from ...websocket.manager import manager
-    from ...schemas.websocket import WSMessage, WSMessageType
-    from datetime import datetime
-    import logging
-    
-    logger = logging.getLogger(__name__)
-    
-    conversation_response = _build_conversation_response(conversation)
-    
-    # DEBUG: Check participants
-    logger.info(f"🐛 DEBUG: conversation.id = {conversation.id}")
-    logger.info(f"🐛 DEBUG: conversation.participants type = {type(conversation.participants)}")
-    logger.info(f"🐛 DEBUG: conversation.participants = {conversation.participants}")
-    logger.info(f"🐛 DEBUG: len(conversation.participants) = {len(conversation.participants)}")
     
     # Register all participants in connection manager
-    for participant in conversation.participants:
-        manager.add_user_to_conversation(participant.user_id, conversation.id)
-    
-    # Send to each participant (including creator)
-    logger.info(f"🔔 Broadcasting NEW_CONVERSATION to {len(conversation.participants)} participants")
-    for participant in conversation.participants:
-        try:
-            logger.info(f"📤 Sending NEW_CONVERSATION to user {participant.user_id}")
-            ws_message = WSMessage(
-                type=WSMessageType.NEW_CONVERSATION,
-                data={
-                    "conversation": conversation_response.model_dump(mode='json')
-                },
-                timestamp=datetime.utcnow()
-            )
-            # Use send_to_user which will log if user is not connected
-            # Log the message being sent
-            logger.info(f"📤 Message to send: type={ws_message.type}, data keys={list(ws_message.data.keys())}")
-            logger.info(f"📤 Conversation data in message: {'conversation' in ws_message.data}")
-            
-            await manager.send_to_user(ws_message, participant.user_id)
-            logger.info(f"✅ NEW_CONVERSATION sent to user {participant.user_id}")
-        except Exception as e:
-            logger.error(f"❌ Error sending NEW_CONVERSATION to user {participant.user_id}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+    manager.add_users_to_conversation([user.id for user in conversation_users], conversation.id)
+    
+    # Broadcast new conversation event to all participants via WebSocket
+    conversation_payload = conversation_response.model_dump()
+    ws_message = WSMessage(
+        type=WSMessageType.NEW_CONVERSATION,
+        data={
+            "conversation": conversation_payload
+        }
+    )
     
-    logger.info(f"🎉 Broadcast complete for conversation {conversation.id}")
+    # Send to each participant (including creator) after the response is out
+    background_tasks.add_task(
+        _broadcast_new_conversation,
+        ws_message,
+        [user.id for user in conversation_users],
+        conversation.id
+    )
     
-    return conversation_response
+    # Returning a Response skips FastAPI's response_model re-validation; the
+    # payload is already built for the WebSocket broadcast
+    return ORJSONResponse(content=conversation_payload, status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/", response_model=List[ConversationResponse])
@@ -222,19 +394,37 @@ async def get_conversations(
     
     Returns conversations ordered by most recent activity
     """
-    # Get conversations where user is a participant with participant/user info
+    # Get conversations where user is a participant with participant/user info.
+    # EXISTS (semi-join) yields each conversation once, so no Python-side dedupe
     result = await db.execute(
         select(Conversation)
-        .join(ConversationParticipant)
+        .where(
+            exists().where(
+                ConversationParticipant.conversation_id == Conversation.id,
+                ConversationParticipant.user_id == current_user.id
+            )
+        )
         .options(selectinload(Conversation.participants).selectinload(ConversationParticipant.user))
-        .where(ConversationParticipant.user_id == current_user.id)
         .order_by(Conversation.updated_at.desc())
         .offset(skip)
         .limit(limit)
     )
-    conversations = result.scalars().unique().all()
+    conversations = result.scalars().all()
     
-    return [_build_conversation_response(conv) for conv in conversations]
+    last_messages, unread_counts = await _get_conversation_summaries(
+        db, [conv.id for conv in conversations], current_user.id
+    )
+    
+    # Returning a Response skips FastAPI's response_model re-validation;
+    # response_model is kept for the OpenAPI schema
+    return ORJSONResponse(content=[
+        _build_conversation_response(
+            conv,
+            last_message=last_messages.get(conv.id),
+            unread_count=unread_counts.get(conv.id, 0)
+        ).model_dump()
+        for conv in conversations
+    ])
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
@@ -283,10 +473,11 @@ async def update_conversation(
     
     Only creator can update
     """
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
+    conversation = await db.get(
+        Conversation,
+        conversation_id,
+        options=[selectinload(Conversation.participants).selectinload(ConversationParticipant.user)]
     )
-    conversation = result.scalar_one_or_none()
     
     if not conversation:
         raise HTTPException(
@@ -314,14 +505,7 @@ async def update_conversation(
     
     await db.commit()
     
-    # Reload with participants
-    result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.participants).selectinload(ConversationParticipant.user))
-        .where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one()
-    
+    # Participants were loaded up front and did not change
     return _build_conversation_response(conversation)
 
 
@@ -336,10 +520,7 @@ async def delete_conversation(
     
     Only creator can delete. This will delete all messages and participants.
     """
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
+    conversation = await db.get(Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -354,8 +535,17 @@ async def delete_conversation(
             detail="Only conversation creator can delete"
         )
     
+    # Read before the cascade removes the participant rows
+    result = await db.execute(
+        select(ConversationParticipant.user_id)
+        .where(ConversationParticipant.conversation_id == conversation_id)
+    )
+    participant_ids = list(result.scalars())
+    
     await db.delete(conversation)
     await db.commit()
+    await _forget_conversation_members(conversation_id)
+    await _forget_user_conversations(participant_ids)
     
     return None
 
@@ -369,38 +559,29 @@ async def get_participants(
     """
     Get all participants in a conversation
     """
-    # Verify user is participant
+    # Get all participants with the user columns the response needs
     result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
-        )
+        select(User.id, User.username, User.display_name, ConversationParticipant.joined_at)
+        .join(ConversationParticipant, User.id == ConversationParticipant.user_id)
+        .where(ConversationParticipant.conversation_id == conversation_id)
     )
-    if not result.scalar_one_or_none():
+    participants = result.all()
+    
+    # Verify user is participant (derived from the same result set)
+    if not any(user_id == current_user.id for user_id, _, _, _ in participants):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not a participant in this conversation"
         )
     
-    # Get all participants with user info
-    result = await db.execute(
-        select(User, ConversationParticipant.joined_at)
-        .join(ConversationParticipant, User.id == ConversationParticipant.user_id)
-        .where(ConversationParticipant.conversation_id == conversation_id)
-    )
-    participants = result.all()
-    
     return [
-        ConversationParticipantResponse(
-            user_id=user.id,
-            username=user.username,
-            display_name=user.display_name,
+        ConversationParticipantResponse.model_construct(
+            user_id=user_id,
+            username=username,
+            display_name=display_name,
             joined_at=joined_at
         )
-        for user, joined_at in participants
+        for user_id, username, display_name, joined_at in participants
     ]
 
 
@@ -408,6 +589,7 @@ async def get_participants(
 async def add_participant(
     conversation_id: UUID,
     user_id: UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -418,10 +600,7 @@ async def add_participant(
     Only friends can be added. Max 100 members.
     """
     # Get conversation
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
+    conversation = await db.get(Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -443,59 +622,51 @@ async def add_participant(
             detail="Only conversation creator can add participants"
         )
     
-    # Check current participant count
+    # Load the added user together with participant count, friendship and
+    # membership flags in a single round-trip
     result = await db.execute(
-        select(func.count(ConversationParticipant.user_id))
-        .where(ConversationParticipant.conversation_id == conversation_id)
-    )
-    current_count = result.scalar_one()
-    
-    if current_count >= 100:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Group has reached maximum 100 members"
+        select(
+            User,
+            select(func.count(ConversationParticipant.user_id))
+            .where(ConversationParticipant.conversation_id == conversation_id)
+            .scalar_subquery(),
+            exists().where(
+                Friendship.between(current_user.id, user_id),
+                Friendship.status == FriendshipState.accepted
+            ),
+            exists().where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id == user_id
+            )
         )
+        .where(User.id == user_id)
+    )
+    row = result.one_or_none()
     
     # Check if user exists
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    added_user = result.scalar_one_or_none()
-    if not added_user:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    added_user, current_count, is_friend, is_participant = row
     
-    # Check if friend
-    result = await db.execute(
-        select(Friendship).where(
-            or_(
-                and_(Friendship.user_id == current_user.id, Friendship.friend_id == user_id),
-                and_(Friendship.user_id == user_id, Friendship.friend_id == current_user.id)
-            ),
-            Friendship.status == "accepted"
+    # Check current participant count
+    if current_count >= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Group has reached maximum 100 members"
         )
-    )
-    friendship = result.scalar_one_or_none()
     
-    if not friendship:
+    # Check if friend
+    if not is_friend:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You can only add friends to the group"
         )
     
     # Check if already participant
-    result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id == user_id
-            )
-        )
-    )
-    if result.scalar_one_or_none():
+    if is_participant:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User is already a participant"
@@ -507,9 +678,8 @@ async def add_participant(
         user_id=user_id
     )
     db.add(new_participant)
-    await db.flush()
     
-    # Create system message
+    # Create system message (flushed together with the participant)
     system_message = Message(
         conversation_id=conversation_id,
         sender_id=None,
@@ -523,21 +693,7 @@ async def add_participant(
     conversation.updated_at = system_message.created_at
     
     # Broadcast system message to existing participants
-    ws_system_msg = WSMessage(
-        type=WSMessageType.NEW_MESSAGE,
-        data=WSChatMessage(
-            conversation_id=conversation_id,
-            message_id=system_message.id,
-            sender_id=None,
-            sender_username="System",
-            sender_display_name="System",
-            content=system_message.content,
-            message_type="system",
-            created_at=system_message.created_at
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
-    )
-    await manager.broadcast_to_conversation(ws_system_msg, conversation_id)
+    ws_system_msg = _system_message_event(system_message)
     
     # Send NEW_CONVERSATION to new member
     result = await db.execute(
@@ -550,13 +706,20 @@ async def add_participant(
     
     new_conv_msg = WSMessage(
         type=WSMessageType.NEW_CONVERSATION,
-        data={"conversation": conversation_response.model_dump(mode='json')},
-        timestamp=datetime.utcnow()
+        data={"conversation": conversation_response.model_dump()}
     )
-    await manager.send_personal_message(new_conv_msg, user_id)
-    manager.add_user_to_conversation(user_id, conversation_id)
     
     await db.commit()
+    await _forget_user_conversations([user_id])
+    
+    # Broadcast after the response is sent
+    background_tasks.add_task(
+        _notify_participants_added,
+        conversation_id,
+        ws_system_msg,
+        new_conv_msg,
+        [user_id]
+    )
     
     return {"message": "Participant added successfully"}
 
@@ -574,10 +737,7 @@ async def remove_participant(
     Users can remove themselves. Only creator can remove others.
     """
     # Get conversation
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
+    conversation = await db.get(Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -620,6 +780,8 @@ async def remove_participant(
     # Remove participant
     await db.delete(participant)
     await db.commit()
+    await _forget_conversation_members(conversation_id, user_id)
+    await _forget_user_conversations([user_id])
     
     return None
 
@@ -628,6 +790,7 @@ async def remove_participant(
 async def add_participants_batch(
     conversation_id: UUID,
     request: AddParticipantsBatchRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -640,10 +803,7 @@ async def add_participants_batch(
     - Creates 1 system message for all added users
     """
     # Get conversation
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
+    conversation = await db.get(Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -679,54 +839,58 @@ async def add_participants_batch(
             detail=f"Group can have maximum 100 members. Current: {current_count}, Trying to add: {len(request.user_ids)}"
         )
     
-    # Verify all users exist and are friends
-    added_users = []
+    # Verify all users exist and are friends (set-based queries, not per user)
+    requested = set(request.user_ids)
+    
+    result = await db.execute(
+        select(User).options(raiseload("*")).where(User.id.in_(requested))
+    )
+    users = {user.id: user for user in result.scalars()}
+    
+    result = await db.execute(
+        select(Friendship.user_id, Friendship.friend_id).where(
+            Friendship.between(current_user.id, requested),
+            Friendship.status == FriendshipState.accepted
+        )
+    )
+    friend_ids = {
+        friend_id if user_id == current_user.id else user_id
+        for user_id, friend_id in result.all()
+    }
+    
+    candidate_ids = []
     for user_id in request.user_ids:
-        # Check if user exists
-        result = await db.execute(select(User).where(User.id == user_id))
-        user = result.scalar_one_or_none()
+        user = users.get(user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User {user_id} not found"
             )
         
-        # Check if friend
-        result = await db.execute(
-            select(Friendship).where(
-                or_(
-                    and_(Friendship.user_id == current_user.id, Friendship.friend_id == user_id),
-                    and_(Friendship.user_id == user_id, Friendship.friend_id == current_user.id)
-                ),
-                Friendship.status == "accepted"
-            )
-        )
-        friendship = result.scalar_one_or_none()
-        
-        if not friendship:
+        if user_id not in friend_ids:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"You can only add friends. User {user.display_name} is not your friend"
             )
         
-        # Check if already participant
+        if user_id not in candidate_ids:
+            candidate_ids.append(user_id)
+    
+    # Add new participants in one multi-row INSERT; existing participants
+    # are skipped by the primary key conflict and not returned
+    inserted_ids = set()
+    if candidate_ids:
         result = await db.execute(
-            select(ConversationParticipant)
-            .where(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id == user_id
-            )
-        )
-        if result.scalar_one_or_none():
-            continue  # Skip if already participant
-        
-        # Add participant
-        new_participant = ConversationParticipant(
-            conversation_id=conversation_id,
-            user_id=user_id
+            pg_insert(ConversationParticipant)
+            .values([
+                {"conversation_id": conversation_id, "user_id": user_id}
+                for user_id in candidate_ids
+            ])
+            .on_conflict_do_nothing(index_elements=["conversation_id", "user_id"])
+            .returning(ConversationParticipant.user_id)
         )
-        db.add(new_participant)
-        added_users.append(user)
+        inserted_ids = set(result.scalars())
+    added_users = [users[user_id] for user_id in candidate_ids if user_id in inserted_ids]
     
     # Create 1 system message for all added users
     if added_users:
@@ -745,31 +909,18 @@ async def add_participants_batch(
             file_type="system"
         )
         db.add(system_message)
-        await db.flush()
         
-        # Update conversation updated_at
-        conversation.updated_at = system_message.created_at
+        # Update conversation updated_at; now() is fixed per transaction, so
+        # this equals the system message's created_at without flushing first
+        conversation.updated_at = func.now()
+        
+        # Message INSERT (created_at returned via RETURNING), conversation
+        # UPDATE and COMMIT go out together
+        await db.commit()
+        await _forget_user_conversations([added_user.id for added_user in added_users])
         
         # Broadcast to existing participants (system message)
-        ws_system_msg = WSMessage(
-            type=WSMessageType.NEW_MESSAGE,
-            data=WSChatMessage(
-                conversation_id=conversation_id,
-                message_id=system_message.id,
-                sender_id=None,
-                sender_username="System",
-                sender_display_name="System",
-                content=system_message.content,
-                message_type="system",
-                created_at=system_message.created_at
-            ).model_dump(mode='json'),
-            timestamp=datetime.utcnow()
-        )
-        await manager.broadcast_to_conversation(
-            ws_system_msg,
-            conversation_id,
-            exclude_user_id=None  # Send to all including creator
-        )
+        ws_system_msg = _system_message_event(system_message)
         
         # Send NEW_CONVERSATION notification to new members (so group appears immediately)
         result = await db.execute(
@@ -780,20 +931,23 @@ async def add_participants_batch(
         conv = result.scalar_one()
         conversation_response = _build_conversation_response(conv)
         
-        for added_user in added_users:
-            new_conv_msg = WSMessage(
-                type=WSMessageType.NEW_CONVERSATION,
-                data={
-                    "conversation": conversation_response.model_dump(mode='json')
-                },
-                timestamp=datetime.utcnow()
-            )
-            await manager.send_personal_message(new_conv_msg, added_user.id)
-            
-            # Also register user to conversation in connection manager
-            manager.add_user_to_conversation(added_user.id, conversation_id)
-    
-    await db.commit()
+        new_conv_msg = WSMessage(
+            type=WSMessageType.NEW_CONVERSATION,
+            data={
+                "conversation": conversation_response.model_dump()
+            }
+        )
+        
+        # Broadcast after the response is sent
+        background_tasks.add_task(
+            _notify_participants_added,
+            conversation_id,
+            ws_system_msg,
+            new_conv_msg,
+            [added_user.id for added_user in added_users]
+        )
+    else:
+        await db.commit()
     
     return {
         "message": f"Added {len(added_users)} participant(s) successfully",
@@ -813,10 +967,7 @@ async def unfriend_in_direct_chat(
     This removes the friendship relationship but keeps the conversation
     """
     # Get conversation
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
+    conversation = await db.get(Conversation, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -831,46 +982,35 @@ async def unfriend_in_direct_chat(
             detail="Can only unfriend in direct conversations"
         )
     
-    # Check if user is participant
+    # Get both participants in one query
     result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id == current_user.id
-        )
+        select(ConversationParticipant.user_id)
+        .where(ConversationParticipant.conversation_id == conversation_id)
     )
-    if not result.scalar_one_or_none():
+    participant_ids = set(result.scalars())
+    
+    # Check if user is participant
+    if current_user.id not in participant_ids:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not a participant in this conversation"
         )
     
     # Get the other user in direct chat
-    result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id != current_user.id
-        )
-    )
-    other_participant = result.scalar_one_or_none()
-    
-    if not other_participant:
+    other_ids = participant_ids - {current_user.id}
+    if len(other_ids) != 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Direct conversation must have exactly 2 participants"
         )
     
-    other_user_id = other_participant.user_id
+    other_user_id = other_ids.pop()
     
     # Find and delete friendship (check both directions)
     result = await db.execute(
         select(Friendship).where(
-            or_(
-                and_(Friendship.user_id == current_user.id, Friendship.friend_id == other_user_id),
-                and_(Friendship.user_id == other_user_id, Friendship.friend_id == current_user.id)
-            ),
-            Friendship.status == "accepted"
+            Friendship.between(current_user.id, other_user_id),
+            Friendship.status == FriendshipState.accepted
         )
     )
     friendship = result.scalar_one_or_none()
@@ -884,6 +1024,7 @@ async def unfriend_in_direct_chat(
     # Delete friendship
     await db.delete(friendship)
     await db.commit()
+    await cache_delete(*friend_list_keys(current_user.id), *friend_list_keys(other_user_id))
     
     return None
 
@@ -891,6 +1032,7 @@ async def unfriend_in_direct_chat(
 @router.delete("/{conversation_id}/leave", status_code=status.HTTP_204_NO_CONTENT)
 async def leave_conversation(
     conversation_id: UUID,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -900,124 +1042,91 @@ async def leave_conversation(
     For direct chat: Conversation disappears from your list (friendship NOT deleted)
     For group chat: You leave the group, system message created
     """
-    # Get participant record
+    # Load conversation, own membership and co-participants in one round-trip
+    others = aliased(ConversationParticipant)
     result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id == current_user.id
+        select(
+            Conversation,
+            func.array_remove(func.array_agg(others.user_id), current_user.id).label("other_ids")
         )
+        .join(
+            ConversationParticipant,
+            and_(
+                ConversationParticipant.conversation_id == Conversation.id,
+                ConversationParticipant.user_id == current_user.id
+            )
+        )
+        .join(others, others.conversation_id == Conversation.id)
+        .where(Conversation.id == conversation_id)
+        .group_by(Conversation.id)
     )
-    participant = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not participant:
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="You are not a participant in this conversation"
         )
     
-    # Get conversation to check type
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one()
+    conversation, other_ids = row
     
     # Remove participant
-    await db.delete(participant)
+    await db.execute(
+        delete(ConversationParticipant)
+        .where(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id == current_user.id
+        )
+    )
     
     # For group chat: Create system message and check if need to disband
     if conversation.type == ConversationType.group:
         # Create system message: "{username} đã rời khỏi nhóm"
-        system_message = Message(
-            conversation_id=conversation_id,
-            sender_id=None,  # System message has no sender
-            content=f"{current_user.display_name} đã rời khỏi nhóm",
-            file_type="system"  # Mark as system message
+        system_message = await _insert_system_message(
+            db, conversation_id, f"{current_user.display_name} đã rời khỏi nhóm"
         )
-        db.add(system_message)
-        await db.flush()
         
         # Update conversation updated_at
         conversation.updated_at = system_message.created_at
         
-        # Check remaining participants count
-        result = await db.execute(
-            select(func.count(ConversationParticipant.user_id))
-            .where(ConversationParticipant.conversation_id == conversation_id)
-        )
-        remaining_count = result.scalar_one()
-        
         # If only 1 person left, auto-disband group
-        if remaining_count == 1:
-            # Get the last person
-            result = await db.execute(
-                select(ConversationParticipant)
-                .where(ConversationParticipant.conversation_id == conversation_id)
-            )
-            last_participant = result.scalar_one()
+        if len(other_ids) == 1:
+            last_user_id = other_ids[0]
             
             # Create system message for last person
-            disband_message = Message(
-                conversation_id=conversation_id,
-                sender_id=None,
-                content="Nhóm đã tự động giải tán vì chỉ còn lại bạn",
-                file_type="system"
+            disband_message = await _insert_system_message(
+                db, conversation_id, "Nhóm đã tự động giải tán vì chỉ còn lại bạn"
             )
-            db.add(disband_message)
-            await db.flush()
             
             # Send notification to last person
-            disband_ws_msg = WSMessage(
-                type=WSMessageType.NEW_MESSAGE,
-                data=WSChatMessage(
-                    conversation_id=conversation_id,
-                    message_id=disband_message.id,
-                    sender_id=None,
-                    sender_username="System",
-                    sender_display_name="System",
-                    content=disband_message.content,
-                    message_type="system",
-                    created_at=disband_message.created_at
-                ).model_dump(mode='json'),
-                timestamp=datetime.utcnow()
-            )
+            disband_ws_msg = _system_message_event(disband_message)
             # Commit before sending WebSocket (so message is saved)
             await db.commit()
             
-            # Send notification to last person
-            await manager.send_personal_message(disband_ws_msg, last_participant.user_id)
-            
-            # Delete conversation (cascade will delete all messages and participants)
-            # Need to get conversation again after commit
-            result = await db.execute(
-                select(Conversation).where(Conversation.id == conversation_id)
+            # Send notification to last person after the response is sent
+            background_tasks.add_task(
+                manager.send_personal_message, disband_ws_msg, last_user_id
             )
-            conversation = result.scalar_one()
+            
+            # Delete conversation (cascade will delete all messages and participants);
+            # still attached to the session since commits do not expire it
             await db.delete(conversation)
             await db.commit()
+            await _forget_conversation_members(conversation_id)
+            await _forget_user_conversations([current_user.id, last_user_id])
             return None
         else:
             # Broadcast system message to remaining participants
-            leave_ws_msg = WSMessage(
-                type=WSMessageType.NEW_MESSAGE,
-                data=WSChatMessage(
-                    conversation_id=conversation_id,
-                    message_id=system_message.id,
-                    sender_id=None,
-                    sender_username="System",
-                    sender_display_name="System",
-                    content=system_message.content,
-                    message_type="system",
-                    created_at=system_message.created_at
-                ).model_dump(mode='json'),
-                timestamp=datetime.utcnow()
-            )
-            await manager.broadcast_to_conversation(
+            leave_ws_msg = _system_message_event(system_message)
+            background_tasks.add_task(
+                manager.broadcast_to_conversation,
                 leave_ws_msg,
                 conversation_id,
                 exclude_user_id=current_user.id
             )
     
     await db.commit()
+    await _forget_conversation_members(conversation_id, current_user.id)
+    await _forget_user_conversations([current_user.id])
     return None
 
@@ -1,32 +1,68 @@
 """
 File upload and download endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
+import asyncio
 import os
+import time
 
 from ...database import get_db
 from ...models.user import User
+from ...core.config import settings
 from ...core.deps import get_current_active_user
 from ...core.file_utils import (
     validate_file_type,
-    validate_file_size,
     generate_unique_filename,
     get_storage_path,
     save_upload_file,
     generate_thumbnail,
+    get_thumbnail_path,
     detect_mime_type,
-    FileCategory
+    FileCategory,
+    FileTooLargeError,
+    UPLOAD_DIR
 )
 from ...schemas.file import FileUploadResponse, FileValidationError
 
 router = APIRouter()
 
+# Resolved once; every served/deleted path must stay inside it
+UPLOAD_ROOT = UPLOAD_DIR.resolve()
+
+
+def _resolve_upload_path(category: str, filename: str) -> Path:
+    """
+    Build the on-disk path for a category/filename pair
+    
+    Rejects names with separators or dot components and any path that
+    resolves outside the uploads directory (e.g. via symlinks).
+    
+    Raises:
+        HTTPException: 400 if the path is not a plain file inside the uploads dir
+    """
+    for part in (category, filename):
+        if part in ("", ".", "..") or "/" in part or "\\" in part:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid filename"
+            )
+    
+    file_path = (UPLOAD_ROOT / category / filename).resolve()
+    if UPLOAD_ROOT not in file_path.parents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid filename"
+        )
+    return file_path
+
 
 @router.post("/upload", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
@@ -49,7 +85,8 @@ async def upload_file(
     - file_type: MIME type
     - file_size: Size in bytes
     - file_category: Category (image/document/audio/video/other)
-    - thumbnail_url: Thumbnail URL (only for images)
+    - thumbnail_url: Thumbnail URL (only for images; generated after the
+      response is sent, so it may 404 briefly)
     """
     # Read file content type
     content_type = file.content_type or "application/octet-stream"
@@ -68,37 +105,30 @@ async def upload_file(
     # Get storage path
     storage_path = get_storage_path(category, unique_filename)
     
-    # Save file
+    # Save file, aborting as soon as the category size limit is exceeded;
+    # the actual MIME type is detected from the content while saving
     try:
-        file_size = await save_upload_file(file, storage_path)
+        file_size, actual_mime = await save_upload_file(file, storage_path, category)
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save file: {str(e)}"
         )
     
-    # Validate file size
-    is_valid_size, size_error = validate_file_size(file_size, category)
-    if not is_valid_size:
-        # Delete the uploaded file
-        storage_path.unlink(missing_ok=True)
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=size_error
-        )
-    
-    # Detect actual MIME type from file content
-    actual_mime = detect_mime_type(storage_path)
-    
     # Generate file URL
     file_url = f"/api/files/download/{category.value}s/{unique_filename}"
     
-    # Generate thumbnail for images
+    # Generate thumbnail for images after the response; the sync task runs in
+    # the threadpool so PIL work does not block the event loop
     thumbnail_url = None
     if category == FileCategory.IMAGE:
-        thumb_path = generate_thumbnail(storage_path)
-        if thumb_path:
-            thumbnail_url = f"/api/files/download/{category.value}s/{thumb_path.name}"
+        background_tasks.add_task(generate_thumbnail, storage_path)
+        thumbnail_url = f"/api/files/download/{category.value}s/{get_thumbnail_path(storage_path).name}"
     
     return FileUploadResponse(
         file_url=file_url,
@@ -125,14 +155,7 @@ async def download_file(
     File content with appropriate Content-Type header
     """
     # Security: Prevent path traversal
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid filename"
-        )
-    
-    # Construct file path
-    file_path = Path(f"/app/uploads/{category}/{filename}")
+    file_path = _resolve_upload_path(category, filename)
     
     # Check if file exists
     if not file_path.exists() or not file_path.is_file():
@@ -144,6 +167,16 @@ async def download_file(
     # Detect MIME type
     mime_type = detect_mime_type(file_path)
     
+    # Behind nginx: let it send the file with sendfile(2) from an internal location
+    if settings.FILE_ACCEL_REDIRECT_PREFIX:
+        return Response(
+            headers={
+                "X-Accel-Redirect": f"{settings.FILE_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{category}/{filename}",
+                "Content-Type": mime_type,
+                "Content-Disposition": f'attachment; filename="{filename}"'
+            }
+        )
+    
     # Return file
     return FileResponse(
         path=file_path,
@@ -167,14 +200,7 @@ async def delete_file(
     **Note**: Only admins or file owners can delete files (for now, any authenticated user can delete)
     """
     # Security: Prevent path traversal
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid filename"
-        )
-    
-    # Construct file path
-    file_path = Path(f"/app/uploads/{category}/{filename}")
+    file_path = _resolve_upload_path(category, filename)
     
     # Check if file exists
     if not file_path.exists():
@@ -189,9 +215,7 @@ async def delete_file(
         
         # Also delete thumbnail if it's an image
         if category == "images":
-            thumb_name = filename.replace(".", "_thumb.")
-            thumb_path = file_path.parent / thumb_name
-            thumb_path.unlink(missing_ok=True)
+            get_thumbnail_path(file_path).unlink(missing_ok=True)
         
         return None
     except Exception as e:
@@ -201,17 +225,15 @@ async def delete_file(
         )
 
 
-@router.get("/stats")
-async def get_upload_stats(
-    current_user: User = Depends(get_current_active_user)
-):
-    """
-    Get upload statistics
-    
-    Returns count and total size of uploaded files by category
-    """
-    from pathlib import Path
-    
+UPLOAD_STATS_TTL_SECONDS = 60
+
+# Last computed upload stats snapshot, shared by all requests
+_upload_stats_cache = {"value": None, "expires_at": 0.0}
+_upload_stats_lock = asyncio.Lock()
+
+
+def _compute_upload_stats() -> dict:
+    """Walk the upload directories and aggregate counts and sizes (blocking)"""
     stats = {}
     upload_dir = Path("/app/uploads")
     
@@ -219,18 +241,25 @@ async def get_upload_stats(
     
     for cat in categories:
         cat_dir = upload_dir / cat
-        if cat_dir.exists():
-            files = list(cat_dir.glob("*"))
-            # Exclude thumbnails
-            files = [f for f in files if "_thumb" not in f.name]
-            
-            total_size = sum(f.stat().st_size for f in files if f.is_file())
-            
-            stats[cat] = {
-                "count": len(files),
-                "total_size_bytes": total_size,
-                "total_size_mb": round(total_size / (1024 * 1024), 2)
-            }
+        if not cat_dir.exists():
+            continue
+        
+        count = 0
+        total_size = 0
+        with os.scandir(cat_dir) as entries:
+            for entry in entries:
+                # Exclude thumbnails
+                if "_thumb" in entry.name:
+                    continue
+                count += 1
+                if entry.is_file():
+                    total_size += entry.stat().st_size
+        
+        stats[cat] = {
+            "count": count,
+            "total_size_bytes": total_size,
+            "total_size_mb": round(total_size / (1024 * 1024), 2)
+        }
     
     return {
         "categories": stats,
@@ -238,3 +267,25 @@ async def get_upload_stats(
         "total_size_mb": sum(s["total_size_mb"] for s in stats.values())
     }
 
+
+@router.get("/stats")
+async def get_upload_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get upload statistics
+    
+    Returns count and total size of uploaded files by category.
+    Served from a snapshot refreshed at most every UPLOAD_STATS_TTL_SECONDS.
+    """
+    if _upload_stats_cache["expires_at"] > time.monotonic():
+        return _upload_stats_cache["value"]
+    
+    async with _upload_stats_lock:
+        # Another request may have refreshed it while we waited
+        if _upload_stats_cache["expires_at"] <= time.monotonic():
+            # Directory walk does one stat() per file; keep it off the event loop
+            _upload_stats_cache["value"] = await run_in_threadpool(_compute_upload_stats)
+            _upload_stats_cache["expires_at"] = time.monotonic() + UPLOAD_STATS_TTL_SECONDS
+    
+    return _upload_stats_cache["value"]
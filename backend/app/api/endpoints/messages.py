@@ -3,8 +3,8 @@ Message endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, desc
-from typing import List
+from sqlalchemy import select, insert, update, desc, exists, func, literal, tuple_
+from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
 
@@ -37,58 +37,65 @@ async def send_message(
     
     User must be a participant in the conversation
     """
-    # Verify conversation exists and user is participant
+    # Insert only if the user is a participant, so the membership check and the
+    # write are one statement; id and created_at come back in the same round-trip
+    values = {
+        "conversation_id": message_data.conversation_id,
+        "sender_id": current_user.id,
+        "content": message_data.content,
+        "file_url": message_data.file_url,
+        "file_type": message_data.file_type,
+        "file_name": message_data.file_name
+    }
+    is_participant = exists().where(
+        ConversationParticipant.conversation_id == message_data.conversation_id,
+        ConversationParticipant.user_id == current_user.id
+    )
+    messages = Message.__table__
     result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == message_data.conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
+        insert(messages)
+        .from_select(
+            list(values),
+            select(
+                *(literal(value, messages.c[name].type) for name, value in values.items())
+            ).where(is_participant)
         )
+        .returning(messages.c.id, messages.c.created_at)
     )
-    if not result.scalar_one_or_none():
+    row = result.one_or_none()
+    
+    if row is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not a participant in this conversation"
         )
     
-    # Create message
-    new_message = Message(
-        conversation_id=message_data.conversation_id,
-        sender_id=current_user.id,
-        content=message_data.content,
-        file_url=message_data.file_url,
-        file_type=message_data.file_type,
-        file_name=message_data.file_name
-    )
-    db.add(new_message)
+    message_id, created_at = row
     
-    # Update conversation updated_at
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == message_data.conversation_id)
+    # Update conversation updated_at (now() matches created_at within the transaction)
+    await db.execute(
+        update(Conversation)
+        .where(Conversation.id == message_data.conversation_id)
+        .values(updated_at=func.now())
+        .execution_options(synchronize_session=False)
     )
-    conversation = result.scalar_one()
-    conversation.updated_at = new_message.created_at
     
     await db.commit()
-    await db.refresh(new_message)
     
     # Broadcast message via WebSocket to all conversation participants
     ws_message = WSMessage(
         type=WSMessageType.NEW_MESSAGE,
         data=WSChatMessage(
-            conversation_id=new_message.conversation_id,
-            message_id=new_message.id,
-            sender_id=new_message.sender_id,
+            conversation_id=message_data.conversation_id,
+            message_id=message_id,
+            sender_id=current_user.id,
             sender_username=current_user.username,
             sender_display_name=current_user.display_name,
-            content=new_message.content,
-            message_type=new_message.file_type or "text",
-            file_url=new_message.file_url,
-            created_at=new_message.created_at
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+            content=message_data.content,
+            message_type=message_data.file_type or "text",
+            file_url=message_data.file_url,
+            created_at=created_at
+        ).model_dump()
     )
     
     # Broadcast to all participants in the conversation
@@ -98,24 +105,18 @@ async def send_message(
         exclude_user_id=None  # Send to everyone including sender for confirmation
     )
     
-    # Return message with sender info
+    # Return message with sender info; a new message has no edit/read state yet
     msg_response = MessageResponse(
-        id=new_message.id,
-        conversation_id=new_message.conversation_id,
-        sender_id=new_message.sender_id,
+        id=message_id,
+        conversation_id=message_data.conversation_id,
+        sender_id=current_user.id,
         sender_username=current_user.username,
         sender_display_name=current_user.display_name,
-        content=new_message.content,
-        file_url=new_message.file_url,
-        file_type=new_message.file_type,
-        file_name=new_message.file_name,
-        created_at=new_message.created_at,
-        edited_at=new_message.edited_at,
-        is_deleted=new_message.is_deleted,
-        # Read Receipts
-        delivered_at=new_message.delivered_at,
-        read_at=new_message.read_at,
-        read_by_user_id=new_message.read_by_user_id
+        content=message_data.content,
+        file_url=message_data.file_url,
+        file_type=message_data.file_type,
+        file_name=message_data.file_name,
+        created_at=created_at
     )
     
     return msg_response
@@ -124,6 +125,8 @@ async def send_message(
 @router.get("/", response_model=List[MessageResponse])
 async def get_messages(
     conversation_id: UUID,
+    before: Optional[datetime] = None,
+    before_id: Optional[UUID] = None,
     skip: int = 0,
     limit: int = 50,
     current_user: User = Depends(get_current_active_user),
@@ -135,61 +138,118 @@ async def get_messages(
     Returns messages ordered by newest first (pagination supported)
     
     - **conversation_id**: Conversation ID (query parameter)
-    - **skip**: Number of messages to skip
+    - **before** / **before_id**: Cursor - created_at and id of the oldest
+      message already loaded; returns messages older than it
+    - **skip**: Number of messages to skip (legacy offset paging, ignored with a cursor)
     - **limit**: Maximum number of messages to return (default 50)
     """
-    # Verify user is participant
-    result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
+    is_participant = exists().where(
+        ConversationParticipant.conversation_id == conversation_id,
+        ConversationParticipant.user_id == current_user.id
+    )
+    
+    # Get messages with sender name columns in one joined query (no ORM objects)
+    query = (
+        select(
+            Message.id,
+            Message.conversation_id,
+            Message.sender_id,
+            Message.content,
+            Message.file_url,
+            Message.file_type,
+            Message.file_name,
+            Message.created_at,
+            Message.edited_at,
+            Message.is_deleted,
+            Message.delivered_at,
+            Message.read_at,
+            Message.read_by_user_id,
+            User.username,
+            User.display_name
         )
+        .outerjoin(User, User.id == Message.sender_id)
+        .where(Message.conversation_id == conversation_id, is_participant)
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(limit)
     )
-    if not result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a participant in this conversation"
+    
+    if before is not None:
+        # Keyset paging: seek on (created_at, id) instead of scanning skipped rows
+        if before_id is not None:
+            query = query.where(tuple_(Message.created_at, Message.id) < tuple_(before, before_id))
+        else:
+            query = query.where(Message.created_at < before)
+    elif skip:
+        query = query.offset(skip)
+    
+    result = await db.execute(query)
+    rows = result.all()
+    
+    # The membership check rides along in the page query; only an empty page
+    # needs a second look to tell "no messages" from "not a participant"
+    if not rows:
+        result = await db.execute(select(is_participant))
+        if not result.scalar():
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not a participant in this conversation"
+            )
+    
+    # Rows come straight from the database, so skip validation
+    return [
+        MessageResponse.model_construct(
+            id=row.id,
+            conversation_id=row.conversation_id,
+            sender_id=row.sender_id,
+            sender_username=row.username or "Unknown",
+            sender_display_name=row.display_name or "Unknown User",
+            content=row.content,
+            file_url=row.file_url,
+            file_type=row.file_type,
+            file_name=row.file_name,
+            created_at=row.created_at,
+            edited_at=row.edited_at,
+            is_deleted=row.is_deleted,
+            # Read Receipts
+            delivered_at=row.delivered_at,
+            read_at=row.read_at,
+            read_by_user_id=row.read_by_user_id
         )
+        for row in rows
+    ]
+
+
+async def _message_update_error(
+    db: AsyncSession,
+    message_id: UUID,
+    user_id: UUID,
+    forbidden_detail: str,
+    deleted_detail: str
+) -> HTTPException:
+    """
+    Explain why a sender-guarded message UPDATE matched no rows
     
-    # Get messages with sender information
-    from sqlalchemy.orm import selectinload
+    Only runs on the failure path, so successful updates stay a single statement.
+    """
     result = await db.execute(
-        select(Message)
-        .options(selectinload(Message.sender))  # Load sender relationship
-        .where(Message.conversation_id == conversation_id)
-        .order_by(desc(Message.created_at))
-        .offset(skip)
-        .limit(limit)
+        select(Message.sender_id).where(Message.id == message_id)
     )
-    messages = result.scalars().all()
-    
-    # Manually build response with sender info
-    messages_response = []
-    for msg in messages:
-        msg_dict = {
-            "id": msg.id,
-            "conversation_id": msg.conversation_id,
-            "sender_id": msg.sender_id,
-            "sender_username": msg.sender.username if msg.sender else "Unknown",
-            "sender_display_name": msg.sender.display_name if msg.sender else "Unknown User",
-            "content": msg.content,
-            "file_url": msg.file_url,
-            "file_type": msg.file_type,
-            "file_name": msg.file_name,
-            "created_at": msg.created_at,
-            "edited_at": msg.edited_at,
-            "is_deleted": msg.is_deleted,
-            # Read Receipts
-            "delivered_at": msg.delivered_at,
-            "read_at": msg.read_at,
-            "read_by_user_id": msg.read_by_user_id
-        }
-        messages_response.append(MessageResponse(**msg_dict))
+    row = result.one_or_none()
     
-    return messages_response
+    if row is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found"
+        )
+    if row.sender_id != user_id:
+        return HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=forbidden_detail
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=deleted_detail
+    )
 
 
 @router.put("/{message_id}", response_model=MessageResponse)
@@ -205,41 +265,28 @@ async def edit_message(
     Only message sender can edit their own messages
     Cannot edit deleted messages
     """
-    # Get message with sender info
-    from sqlalchemy.orm import selectinload
+    # Update only if the caller is the sender and the message is not deleted
     result = await db.execute(
-        select(Message)
-        .options(selectinload(Message.sender))
-        .where(Message.id == message_id)
+        update(Message)
+        .where(
+            Message.id == message_id,
+            Message.sender_id == current_user.id,
+            Message.is_deleted.is_(False)
+        )
+        .values(content=message_update.content, edited_at=func.now())
+        .returning(Message)
+        .execution_options(synchronize_session=False)
     )
     message = result.scalar_one_or_none()
     
     if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
+        raise await _message_update_error(
+            db, message_id, current_user.id,
+            forbidden_detail="You can only edit your own messages",
+            deleted_detail="Cannot edit deleted messages"
         )
     
-    # Check if current user is sender
-    if message.sender_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only edit your own messages"
-        )
-    
-    # Check if message is deleted
-    if message.is_deleted == "true":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot edit deleted messages"
-        )
-    
-    # Update message
-    message.content = message_update.content
-    message.edited_at = datetime.utcnow()
-    
     await db.commit()
-    await db.refresh(message)
     
     # Broadcast edit via WebSocket
     ws_message = WSMessage(
@@ -250,8 +297,7 @@ async def edit_message(
             sender_id=message.sender_id,
             content=message.content,
             edited_at=message.edited_at
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+        ).model_dump()
     )
     
     await manager.broadcast_to_conversation(
@@ -260,13 +306,13 @@ async def edit_message(
         exclude_user_id=None
     )
     
-    # Return updated message with sender info
+    # Return updated message with sender info (the sender is the current user)
     msg_response = MessageResponse(
         id=message.id,
         conversation_id=message.conversation_id,
         sender_id=message.sender_id,
-        sender_username=message.sender.username if message.sender else "Unknown",
-        sender_display_name=message.sender.display_name if message.sender else "Unknown User",
+        sender_username=current_user.username,
+        sender_display_name=current_user.display_name,
         content=message.content,
         file_url=message.file_url,
         file_type=message.file_type,
@@ -298,75 +344,86 @@ async def mark_message_as_read(
     - participant.last_read_message_id
     - Broadcasts MESSAGE_READ event via WebSocket
     """
-    # Get message
-    result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
-    message = result.scalar_one_or_none()
-    
-    if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
+    # Mark as read only if the caller participates and is not the sender
+    is_participant = (
+        select(ConversationParticipant.user_id)
+        .where(
+            ConversationParticipant.conversation_id == Message.conversation_id,
+            ConversationParticipant.user_id == current_user.id
         )
-    
-    # Check if user is participant in the conversation
+        .exists()
+    )
     result = await db.execute(
-        select(ConversationParticipant)
+        update(Message)
         .where(
-            and_(
-                ConversationParticipant.conversation_id == message.conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
+            Message.id == message_id,
+            Message.sender_id.is_distinct_from(current_user.id),
+            is_participant
         )
+        .values(read_at=func.now(), read_by_user_id=current_user.id)
+        .returning(Message.conversation_id, Message.read_at)
+        .execution_options(synchronize_session=False)
     )
-    participant = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not participant:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a participant in this conversation"
+    if row is None:
+        # Work out which check failed
+        result = await db.execute(
+            select(Message.sender_id, is_participant)
+            .where(Message.id == message_id)
         )
-    
-    # Don't mark own messages as read
-    if message.sender_id == current_user.id:
+        failed = result.one_or_none()
+        
+        if failed is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+        if not failed[1]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not a participant in this conversation"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot mark your own message as read"
         )
     
-    # Update message read status
-    read_timestamp = datetime.utcnow()
-    message.read_at = read_timestamp
-    message.read_by_user_id = current_user.id
+    conversation_id, read_timestamp = row
     
     # Also update participant's last read message
-    participant.last_read_message_id = message_id
+    await db.execute(
+        update(ConversationParticipant)
+        .where(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id == current_user.id
+        )
+        .values(last_read_message_id=message_id)
+        .execution_options(synchronize_session=False)
+    )
     
     await db.commit()
-    await db.refresh(message)
     
     # Broadcast MESSAGE_READ event via WebSocket to conversation participants
     read_event = WSMessage(
         type=WSMessageType.MESSAGE_READ,
         data=WSMessageRead(
-            conversation_id=message.conversation_id,
-            message_id=message.id,
+            conversation_id=conversation_id,
+            message_id=message_id,
             read_by_user_id=current_user.id,
             read_by_username=current_user.username,
             read_at=read_timestamp
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+        ).model_dump()
     )
     
     await manager.broadcast_to_conversation(
         read_event,
-        message.conversation_id,
+        conversation_id,
         exclude_user_id=current_user.id  # Don't send to the user who marked it
     )
     
     return MessageReadResponse(
-        message_id=message.id,
+        message_id=message_id,
         read_at=read_timestamp,
         read_by_user_id=current_user.id
     )
@@ -384,56 +441,48 @@ async def delete_message(
     Only message sender can delete their own messages
     Message content is replaced with deletion notice
     """
-    # Get message
+    # Soft delete only if the caller is the sender and it is not deleted yet
     result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
-    message = result.scalar_one_or_none()
-    
-    if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
+        update(Message)
+        .where(
+            Message.id == message_id,
+            Message.sender_id == current_user.id,
+            Message.is_deleted.is_(False)
         )
-    
-    # Check if current user is sender
-    if message.sender_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only delete your own messages"
+        .values(
+            is_deleted=True,
+            content="This message was deleted",
+            file_url=None,
+            file_type=None,
+            file_name=None
         )
+        .returning(Message.conversation_id)
+        .execution_options(synchronize_session=False)
+    )
+    conversation_id = result.scalar_one_or_none()
     
-    # Check if already deleted
-    if message.is_deleted == "true":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Message already deleted"
+    if conversation_id is None:
+        raise await _message_update_error(
+            db, message_id, current_user.id,
+            forbidden_detail="You can only delete your own messages",
+            deleted_detail="Message already deleted"
         )
     
-    # Soft delete
-    message.is_deleted = "true"
-    message.content = "This message was deleted"
-    message.file_url = None
-    message.file_type = None
-    message.file_name = None
-    
     await db.commit()
-    await db.refresh(message)
     
     # Broadcast delete via WebSocket
     ws_message = WSMessage(
         type=WSMessageType.MESSAGE_DELETED,
         data=WSMessageDeleted(
-            conversation_id=message.conversation_id,
-            message_id=message.id,
-            sender_id=message.sender_id
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+            conversation_id=conversation_id,
+            message_id=message_id,
+            sender_id=current_user.id
+        ).model_dump()
     )
     
     await manager.broadcast_to_conversation(
         ws_message,
-        message.conversation_id,
+        conversation_id,
         exclude_user_id=None
     )
     
@@ -3,11 +3,10 @@ Message Reaction endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
-from typing import List
+from sqlalchemy import select, delete, and_, exists, func, literal_column
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by, insert as pg_insert
+from typing import List, Optional, Tuple
 from uuid import UUID
-from datetime import datetime
-from collections import defaultdict
 
 from ...database import get_db
 from ...models.user import User
@@ -21,11 +20,95 @@ from ...schemas.reaction import (
     MessageWithReactions
 )
 from ...schemas.websocket import WSMessage, WSMessageType, WSReactionAdded, WSReactionRemoved
+from ...core.cache import (
+    cache_get,
+    cache_set,
+    cache_sadd_if_unchanged,
+    cache_sismember,
+    conversation_members_key,
+    conversation_members_version_key,
+    CONVERSATION_MEMBERS_TTL_SECONDS
+)
 from ...core.deps import get_current_active_user
 from ...websocket import manager
 
 router = APIRouter()
 
+# message_id -> conversation_id never changes, so it can be cached for long
+MESSAGE_CONVERSATION_TTL_SECONDS = 86400
+
+
+async def _get_conversation_id(db: AsyncSession, message_id: UUID) -> Optional[UUID]:
+    """
+    Get the conversation a message belongs to, via the Redis cache when available
+    
+    Returns:
+        Conversation UUID, or None if the message does not exist
+    """
+    key = f"msg:{message_id}:conv"
+    cached = await cache_get(key)
+    if cached:
+        return UUID(cached)
+    
+    result = await db.execute(
+        select(Message.conversation_id).where(Message.id == message_id)
+    )
+    conversation_id = result.scalar_one_or_none()
+    if conversation_id is not None:
+        await cache_set(key, str(conversation_id), MESSAGE_CONVERSATION_TTL_SECONDS)
+    return conversation_id
+
+
+async def _get_message_access(db: AsyncSession, message_id: UUID, user_id: UUID) -> Optional[Tuple[UUID, bool]]:
+    """
+    Get a message's conversation and whether the user participates in it
+    
+    Served from the Redis cache when both facts are cached; otherwise one
+    joined query, whose result is written back to the cache unless the
+    membership was invalidated while the query ran
+    
+    Returns:
+        (conversation_id, is_participant), or None if the message does not exist
+    """
+    conv_key = f"msg:{message_id}:conv"
+    cached = await cache_get(conv_key)
+    if cached and await cache_sismember(conversation_members_key(cached), str(user_id)):
+        return UUID(cached), True
+    
+    # Read before the query so a removal committed meanwhile blocks the
+    # write-back; on a conversation id miss membership is cached next time
+    members_version = (
+        await cache_get(conversation_members_version_key(cached)) if cached else None
+    )
+    result = await db.execute(
+        select(Message.conversation_id, ConversationParticipant.user_id.label("participant_id"))
+        .select_from(Message)
+        .outerjoin(
+            ConversationParticipant,
+            and_(
+                ConversationParticipant.conversation_id == Message.conversation_id,
+                ConversationParticipant.user_id == user_id
+            )
+        )
+        .where(Message.id == message_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    
+    if not cached:
+        await cache_set(conv_key, str(row.conversation_id), MESSAGE_CONVERSATION_TTL_SECONDS)
+    is_participant = row.participant_id is not None
+    if is_participant and cached:
+        await cache_sadd_if_unchanged(
+            conversation_members_key(row.conversation_id),
+            str(user_id),
+            guard_key=conversation_members_version_key(row.conversation_id),
+            guard_value=members_version,
+            ttl=CONVERSATION_MEMBERS_TTL_SECONDS
+        )
+    return row.conversation_id, is_participant
+
 
 @router.post("/{message_id}/reactions", response_model=ReactionResponse, status_code=status.HTTP_201_CREATED)
 async def add_reaction(
@@ -42,98 +125,78 @@ async def add_reaction(
     
     User must be participant in the conversation
     """
-    # Get message
-    result = await db.execute(
-        select(Message).where(Message.id == message_id)
-    )
-    message = result.scalar_one_or_none()
+    access = await _get_message_access(db, message_id, current_user.id)
     
-    if not message:
+    if access is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
     
+    conversation_id, is_participant = access
+    
     # Verify user is participant in conversation
-    result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == message.conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
-        )
-    )
-    if not result.scalar_one_or_none():
+    if not is_participant:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not a participant in this conversation"
         )
     
-    # Check if reaction already exists
+    # Upsert: the no-op update makes RETURNING yield the existing row on
+    # conflict, and xmax = 0 only holds for a freshly inserted row
+    stmt = pg_insert(MessageReaction).values(
+        message_id=message_id,
+        user_id=current_user.id,
+        emoji=reaction_data.emoji
+    )
     result = await db.execute(
-        select(MessageReaction)
-        .where(
-            and_(
-                MessageReaction.message_id == message_id,
-                MessageReaction.user_id == current_user.id,
-                MessageReaction.emoji == reaction_data.emoji
-            )
+        stmt.on_conflict_do_update(
+            index_elements=[MessageReaction.message_id, MessageReaction.user_id, MessageReaction.emoji],
+            set_={"emoji": stmt.excluded.emoji}
         )
-    )
-    existing_reaction = result.scalar_one_or_none()
-    
-    if existing_reaction:
-        # Return existing reaction
-        return ReactionResponse(
-            id=existing_reaction.id,
-            message_id=existing_reaction.message_id,
-            user_id=existing_reaction.user_id,
-            user_username=current_user.username,
-            user_display_name=current_user.display_name,
-            emoji=existing_reaction.emoji,
-            created_at=existing_reaction.created_at
+        .returning(
+            MessageReaction.id,
+            MessageReaction.created_at,
+            literal_column("xmax = 0").label("inserted")
         )
+    )
+    reaction = result.one()
+    await db.commit()
     
-    # Create new reaction
-    new_reaction = MessageReaction(
+    reaction_response = ReactionResponse(
+        id=reaction.id,
         message_id=message_id,
         user_id=current_user.id,
-        emoji=reaction_data.emoji
+        user_username=current_user.username,
+        user_display_name=current_user.display_name,
+        emoji=reaction_data.emoji,
+        created_at=reaction.created_at
     )
-    db.add(new_reaction)
-    await db.commit()
-    await db.refresh(new_reaction)
+    
+    if not reaction.inserted:
+        # Return existing reaction
+        return reaction_response
     
     # Broadcast reaction via WebSocket
     ws_message = WSMessage(
         type=WSMessageType.REACTION_ADDED,
         data=WSReactionAdded(
-            conversation_id=message.conversation_id,
+            conversation_id=conversation_id,
             message_id=message_id,
             user_id=current_user.id,
             username=current_user.username,
             emoji=reaction_data.emoji,
-            created_at=new_reaction.created_at
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+            created_at=reaction.created_at
+        ).model_dump()
     )
     
     await manager.broadcast_to_conversation(
         ws_message,
-        message.conversation_id,
+        conversation_id,
         exclude_user_id=None
     )
     
-    return ReactionResponse(
-        id=new_reaction.id,
-        message_id=new_reaction.message_id,
-        user_id=new_reaction.user_id,
-        user_username=current_user.username,
-        user_display_name=current_user.display_name,
-        emoji=new_reaction.emoji,
-        created_at=new_reaction.created_at
-    )
+    return reaction_response
 
 
 @router.delete("/{message_id}/reactions/{emoji}", status_code=status.HTTP_200_OK)
@@ -151,56 +214,47 @@ async def remove_reaction(
     
     User can only remove their own reactions
     """
-    # Get message
+    # Delete reaction
     result = await db.execute(
-        select(Message).where(Message.id == message_id)
+        delete(MessageReaction)
+        .where(
+            MessageReaction.message_id == message_id,
+            MessageReaction.user_id == current_user.id,
+            MessageReaction.emoji == emoji
+        )
+        .returning(MessageReaction.id)
     )
-    message = result.scalar_one_or_none()
+    deleted = result.scalar_one_or_none() is not None
     
-    if not message:
+    conversation_id = await _get_conversation_id(db, message_id)
+    if conversation_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
     
-    # Find reaction
-    result = await db.execute(
-        select(MessageReaction)
-        .where(
-            and_(
-                MessageReaction.message_id == message_id,
-                MessageReaction.user_id == current_user.id,
-                MessageReaction.emoji == emoji
-            )
-        )
-    )
-    reaction = result.scalar_one_or_none()
-    
-    if not reaction:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reaction not found"
         )
     
-    # Delete reaction
-    await db.delete(reaction)
     await db.commit()
     
     # Broadcast removal via WebSocket
     ws_message = WSMessage(
         type=WSMessageType.REACTION_REMOVED,
         data=WSReactionRemoved(
-            conversation_id=message.conversation_id,
+            conversation_id=conversation_id,
             message_id=message_id,
             user_id=current_user.id,
             emoji=emoji
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+        ).model_dump()
     )
     
     await manager.broadcast_to_conversation(
         ws_message,
-        message.conversation_id,
+        conversation_id,
         exclude_user_id=None
     )
     
@@ -220,71 +274,71 @@ async def get_message_reactions(
     
     Returns summary with counts and user lists for each emoji
     """
-    # Get message
-    result = await db.execute(
-        select(Message).where(Message.id == message_id)
+    # Membership is checked inside the aggregate query, so a message with
+    # reactions costs one round-trip; access is only resolved when it is empty
+    is_participant = exists().where(
+        ConversationParticipant.conversation_id == (
+            select(Message.conversation_id)
+            .where(Message.id == message_id)
+            .scalar_subquery()
+        ),
+        ConversationParticipant.user_id == current_user.id
     )
-    message = result.scalar_one_or_none()
-    
-    if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found"
-        )
     
-    # Verify user is participant
+    # Aggregate per emoji in Postgres: count, whether I reacted, and who reacted
     result = await db.execute(
-        select(ConversationParticipant)
-        .where(
-            and_(
-                ConversationParticipant.conversation_id == message.conversation_id,
-                ConversationParticipant.user_id == current_user.id
-            )
-        )
-    )
-    if not result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You are not a participant in this conversation"
+        select(
+            MessageReaction.emoji,
+            func.count().label("count"),
+            func.bool_or(MessageReaction.user_id == current_user.id).label("reacted_by_me"),
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object(
+                        "user_id", User.id,
+                        "username", User.username,
+                        "display_name", User.display_name
+                    ),
+                    MessageReaction.created_at
+                ),
+                type_=JSON
+            ).label("users")
         )
-    
-    # Get all reactions with user info
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(MessageReaction)
-        .options(selectinload(MessageReaction.user))
-        .where(MessageReaction.message_id == message_id)
+        .join(User, User.id == MessageReaction.user_id)
+        .where(MessageReaction.message_id == message_id, is_participant)
+        .group_by(MessageReaction.emoji)
+        .order_by(func.min(MessageReaction.created_at))
     )
-    reactions = result.scalars().all()
-    
-    # Aggregate by emoji
-    emoji_map = defaultdict(lambda: {"count": 0, "users": [], "reacted_by_me": False})
     
-    for reaction in reactions:
-        emoji_data = emoji_map[reaction.emoji]
-        emoji_data["count"] += 1
-        emoji_data["users"].append({
-            "user_id": str(reaction.user_id),
-            "username": reaction.user.username if reaction.user else "Unknown",
-            "display_name": reaction.user.display_name if reaction.user else "Unknown User"
-        })
-        if reaction.user_id == current_user.id:
-            emoji_data["reacted_by_me"] = True
-    
-    # Build summary list
+    # Rows come straight from the database, so skip validation
     reaction_summaries = [
-        ReactionSummary(
+        ReactionSummary.model_construct(
             emoji=emoji,
-            count=data["count"],
-            users=data["users"],
-            reacted_by_me=data["reacted_by_me"]
+            count=count,
+            users=users,
+            reacted_by_me=reacted_by_me
         )
-        for emoji, data in emoji_map.items()
+        for emoji, count, reacted_by_me, users in result.all()
     ]
     
+    if not reaction_summaries:
+        # No rows: no reactions, or no access to the message
+        access = await _get_message_access(db, message_id, current_user.id)
+        
+        if access is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+        
+        # Verify user is participant
+        if not access[1]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You are not a participant in this conversation"
+            )
+    
     return MessageWithReactions(
         message_id=message_id,
         reactions=reaction_summaries,
-        total_reactions=len(reactions)
+        total_reactions=sum(summary.count for summary in reaction_summaries)
     )
-
@@ -14,6 +14,18 @@ from ...core.deps import get_current_active_user
 
 router = APIRouter()
 
+# Columns exposed by UserResponse; listing them keeps password_hash and
+# ORM identity-map work out of read-only lookups
+USER_RESPONSE_COLUMNS = (
+    User.id,
+    User.email,
+    User.username,
+    User.display_name,
+    User.created_at,
+    User.last_seen_at,
+    User.is_active
+)
+
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
@@ -48,11 +60,11 @@ async def update_current_user(
     if user_update.email is not None:
         # Check if email already taken by another user
         result = await db.execute(
-            select(User).where(
+            select(User.id).where(
                 (User.email == user_update.email) & (User.id != current_user.id)
             )
         )
-        if result.scalar_one_or_none():
+        if result.first() is not None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already taken"
@@ -81,13 +93,12 @@ async def get_users(
     Requires authentication
     """
     result = await db.execute(
-        select(User)
+        select(*USER_RESPONSE_COLUMNS)
         .where(User.is_active == True)
         .offset(skip)
         .limit(limit)
     )
-    users = result.scalars().all()
-    return users
+    return [UserResponse.model_construct(**row._mapping) for row in result]
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -102,15 +113,15 @@ async def get_user_by_id(
     Requires authentication
     """
     result = await db.execute(
-        select(User).where(User.id == user_id)
+        select(*USER_RESPONSE_COLUMNS).where(User.id == user_id)
     )
-    user = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not user:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return user
+    return UserResponse.model_construct(**row._mapping)
 
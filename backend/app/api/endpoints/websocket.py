@@ -4,25 +4,34 @@ WebSocket endpoint for real-time messaging
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import Optional
+from sqlalchemy.orm import raiseload
+from typing import Dict, Optional
+from functools import lru_cache
 from uuid import UUID
-import json
 import logging
+import time
+import orjson
 from datetime import datetime
 
 from ...database import get_db
 from ...models.user import User
 from ...models.conversation import Conversation, ConversationParticipant
 from ...core.security import decode_access_token
+from ...core.cache import (
+    cache_get,
+    cache_sadd_if_unchanged,
+    cache_smembers,
+    user_conversations_key,
+    user_conversations_version_key,
+    USER_CONVERSATIONS_TTL_SECONDS
+)
 from ...websocket import manager
 from ...schemas.websocket import (
     WSMessage,
     WSMessageType,
     WSConnected,
     WSError,
-    WSUserStatus,
-    WSTypingIndicator
+    WSUserStatus
 )
 
 router = APIRouter()
@@ -52,7 +61,9 @@ async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
         
         # Get user from database
         result = await db.execute(
-            select(User).where(User.id == UUID(user_id), User.is_active == True)
+            select(User)
+            .options(raiseload("*"))
+            .where(User.id == UUID(user_id), User.is_active == True)
         )
         user = result.scalar_one_or_none()
         
@@ -66,27 +77,126 @@ async def load_user_conversations(user_id: UUID, db: AsyncSession):
     """
     Load all conversations for a user and register them with the connection manager
     
+    Uses the cached user:{id}:convs set when available, otherwise Postgres
+    
     Args:
         user_id: User's UUID
         db: Database session
     """
     try:
-        # Get all conversations user is part of
-        result = await db.execute(
-            select(ConversationParticipant.conversation_id)
-            .where(ConversationParticipant.user_id == user_id)
-        )
-        conversation_ids = [row[0] for row in result.all()]
+        # Served from the cached set when present; conversation endpoints drop
+        # it whenever the user's membership changes
+        key = user_conversations_key(user_id)
+        cached = await cache_smembers(key)
+        if cached is not None:
+            conversation_ids = [UUID(conv_id) for conv_id in cached]
+        else:
+            # Get all conversations user is part of and backfill the cache;
+            # the version is read first so a membership change committed
+            # meanwhile rejects the stale write-back
+            version_key = user_conversations_version_key(user_id)
+            version = await cache_get(version_key)
+            result = await db.execute(
+                select(ConversationParticipant.conversation_id)
+                .where(ConversationParticipant.user_id == user_id)
+            )
+            conversation_ids = list(result.scalars())
+            await cache_sadd_if_unchanged(
+                key,
+                *(str(conv_id) for conv_id in conversation_ids),
+                guard_key=version_key,
+                guard_value=version,
+                ttl=USER_CONVERSATIONS_TTL_SECONDS
+            )
         
         # Register user to all their conversations
-        for conv_id in conversation_ids:
-            manager.add_user_to_conversation(user_id, conv_id)
+        manager.add_user_to_conversations(user_id, conversation_ids)
         
         logger.info(f"Loaded {len(conversation_ids)} conversations for user {user_id}")
     except Exception as e:
         logger.error(f"Error loading conversations for user {user_id}: {e}")
 
 
+# Minimum seconds between relayed typing-started events per (user, conversation)
+TYPING_THROTTLE_SECONDS = 0.5
+
+# user_id -> {conversation_id: monotonic time of last relayed typing-started event}
+_typing_last_sent: Dict[UUID, Dict[UUID, float]] = {}
+
+
+@lru_cache(maxsize=4096)
+def _parse_uuid(value: str) -> UUID:
+    """
+    Parse a client-supplied UUID string
+    
+    Clients send typing events for the same few conversations over and over,
+    so parsed values are memoized; the bound keeps arbitrary ids from growing
+    the cache. Invalid input raises ValueError/TypeError as UUID() does.
+    """
+    return UUID(value)
+
+
+async def handle_typing(user: User, payload: dict):
+    """
+    Relay a typing indicator to the other conversation participants
+    
+    Only the client-supplied fields are checked; the event itself is built
+    with model_construct and a plain dict instead of validating
+    WSTypingIndicator on every keystroke.
+    
+    Typing-started events are throttled per (user, conversation) to one per
+    TYPING_THROTTLE_SECONDS; typing-stopped events always go through. Events
+    for conversations the user is not registered in are dropped.
+    """
+    conversation_id = _parse_uuid(payload.get("conversation_id"))
+    is_typing = bool(payload.get("is_typing", False))
+    
+    if conversation_id not in manager.user_conversations.get(user.id, ()):
+        return
+    
+    last_sent = _typing_last_sent.setdefault(user.id, {})
+    if is_typing:
+        now = time.monotonic()
+        if now - last_sent.get(conversation_id, 0.0) < TYPING_THROTTLE_SECONDS:
+            return
+        last_sent[conversation_id] = now
+    else:
+        last_sent.pop(conversation_id, None)
+    
+    typing_msg = WSMessage.model_construct(
+        type=WSMessageType.TYPING,
+        data={
+            "conversation_id": conversation_id,
+            "user_id": user.id,
+            "username": user.username,
+            "is_typing": is_typing
+        }
+    )
+    
+    # Broadcast to conversation participants (except sender)
+    await manager.broadcast_to_conversation(
+        typing_msg,
+        conversation_id,
+        exclude_user_id=user.id
+    )
+
+
+async def handle_ping(user: User, payload: dict):
+    """Answer a heartbeat ping"""
+    pong_msg = WSMessage.model_construct(
+        type=WSMessageType.PONG,
+        data={"message": "pong"}
+    )
+    await manager.send_personal_message(pong_msg, user.id)
+
+
+# Inbound message type -> handler(user, payload)
+INBOUND_HANDLERS = {
+    "typing": handle_typing,
+    "ping": handle_ping,
+}
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -143,22 +253,25 @@ async def websocket_endpoint(
             user_id=user.id,
             username=user.username,
             message=f"Connected successfully as {user.username}"
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+        ).model_dump()
     )
     await manager.send_personal_message(connected_msg, user.id)
     
-    # Broadcast user online status to others
+    # Broadcast user online status to people sharing a conversation with
+    # the user, instead of every connected client
     online_msg = WSMessage(
         type=WSMessageType.USER_ONLINE,
         data=WSUserStatus(
             user_id=user.id,
             username=user.username,
             status="online"
-        ).model_dump(mode='json'),
-        timestamp=datetime.utcnow()
+        ).model_dump()
+    )
+    await manager.broadcast_to_conversations(
+        online_msg,
+        manager.user_conversations.get(user.id, ()),
+        exclude_user_id=user.id
     )
-    await manager.broadcast_to_all(online_msg, exclude_user_id=user.id)
     
     logger.info(f"User {user.username} ({user.id}) connected via WebSocket")
     
@@ -170,45 +283,16 @@ async def websocket_endpoint(
             
             try:
                 # Parse message
-                message_data = json.loads(data)
+                message_data = orjson.loads(data)
                 message_type = message_data.get("type")
                 message_payload = message_data.get("data", {})
                 
                 logger.debug(f"Received WebSocket message from {user.username}: {message_type}")
                 
                 # Handle different message types
-                if message_type == "typing":
-                    # Typing indicator
-                    conversation_id = UUID(message_payload.get("conversation_id"))
-                    is_typing = message_payload.get("is_typing", False)
-                    
-                    typing_msg = WSMessage(
-                        type=WSMessageType.TYPING,
-                        data=WSTypingIndicator(
-                            conversation_id=conversation_id,
-                            user_id=user.id,
-                            username=user.username,
-                            is_typing=is_typing
-                        ).model_dump(mode='json'),
-                        timestamp=datetime.utcnow()
-                    )
-                    
-                    # Broadcast to conversation participants (except sender)
-                    await manager.broadcast_to_conversation(
-                        typing_msg,
-                        conversation_id,
-                        exclude_user_id=user.id
-                    )
-                
-                elif message_type == "ping":
-                    # Heartbeat ping
-                    pong_msg = WSMessage(
-                        type=WSMessageType.PONG,
-                        data={"message": "pong"},
-                        timestamp=datetime.utcnow()
-                    )
-                    await manager.send_personal_message(pong_msg, user.id)
-                
+                handler = INBOUND_HANDLERS.get(message_type)
+                if handler is not None:
+                    await handler(user, message_payload)
                 else:
                     # Unknown message type
                     logger.warning(f"Unknown WebSocket message type: {message_type}")
@@ -217,20 +301,18 @@ async def websocket_endpoint(
                         data=WSError(
                             message=f"Unknown message type: {message_type}",
                             code="UNKNOWN_MESSAGE_TYPE"
-                        ).model_dump(mode='json'),
-                        timestamp=datetime.utcnow()
+                        ).model_dump()
                     )
                     await manager.send_personal_message(error_msg, user.id)
             
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 logger.error(f"Invalid JSON received from {user.username}")
                 error_msg = WSMessage(
                     type=WSMessageType.ERROR,
                     data=WSError(
                         message="Invalid JSON format",
                         code="INVALID_JSON"
-                    ).model_dump(mode='json'),
-                    timestamp=datetime.utcnow()
+                    ).model_dump()
                 )
                 await manager.send_personal_message(error_msg, user.id)
             
@@ -242,14 +324,15 @@ async def websocket_endpoint(
                         message="Error processing message",
                         code="PROCESSING_ERROR",
                         details={"error": str(e)}
-                    ).model_dump(mode='json'),
-                    timestamp=datetime.utcnow()
+                    ).model_dump()
                 )
                 await manager.send_personal_message(error_msg, user.id)
     
     except WebSocketDisconnect:
-        # Client disconnected
+        # Client disconnected; disconnect() drops the user's conversation set
+        conversation_ids = manager.user_conversations.get(user.id, set())
         manager.disconnect(user.id)
+        _typing_last_sent.pop(user.id, None)
         
         # Broadcast user offline status
         offline_msg = WSMessage(
@@ -259,14 +342,14 @@ async def websocket_endpoint(
                 username=user.username,
                 status="offline",
                 last_seen_at=datetime.utcnow()
-            ).model_dump(mode='json'),
-            timestamp=datetime.utcnow()
+            ).model_dump()
         )
-        await manager.broadcast_to_all(offline_msg)
+        await manager.broadcast_to_conversations(offline_msg, conversation_ids)
         
         logger.info(f"User {user.username} ({user.id}) disconnected from WebSocket")
     
     except Exception as e:
         logger.error(f"Unexpected error in WebSocket connection for {user.username}: {e}")
         manager.disconnect(user.id)
+        _typing_last_sent.pop(user.id, None)
 
@@ -4,14 +4,17 @@ Handles friend requests, accepting/rejecting, and friend list management
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func
+from sqlalchemy import select, or_, and_, case, func, tuple_
+from sqlalchemy.orm import joinedload, raiseload
 from typing import List
 from uuid import UUID
+import orjson
 
 from ..database import get_db
 from ..models.user import User
-from ..models.friendship import Friendship
+from ..models.friendship import Friendship, FriendshipState
 from ..schemas.friendship import (
     FriendRequestCreate,
     FriendRequestResponse,
@@ -20,9 +23,44 @@ from ..schemas.friendship import (
     FriendshipStatus
 )
 from ..core.deps import get_current_user
+from ..core.cache import cache_get, cache_set, cache_delete, friend_list_keys, FRIEND_LISTS_TTL_SECONDS
 
 router = APIRouter(prefix="/friendships", tags=["friendships"])
 
+# Friend request response action -> resulting status
+RESPONSE_ACTION_STATUS = {
+    "accept": FriendshipState.accepted,
+    "reject": FriendshipState.rejected,
+    "block": FriendshipState.blocked,
+}
+
+
+def _friend_with_user(friendship: Friendship, user: User) -> FriendWithUser:
+    """Build the API view of a friendship from the other user's side"""
+    return FriendWithUser(
+        friendship_id=friendship.id,
+        user_id=user.id,
+        username=user.username,
+        display_name=user.display_name,
+        email=user.email,
+        last_seen_at=user.last_seen_at,
+        is_active=user.is_active,
+        status=friendship.status,
+        created_at=friendship.created_at
+    )
+
+
+async def _forget_friend_lists(*user_ids: UUID):
+    """Drop cached friend lists / received requests of users whose friendship changed"""
+    await cache_delete(*(key for user_id in user_ids for key in friend_list_keys(user_id)))
+
+
+async def _cached_json_response(key: str, items: List[FriendWithUser]) -> Response:
+    """Serialize a list response once, cache it and return it"""
+    payload = orjson.dumps([item.model_dump() for item in items])
+    await cache_set(key, payload.decode(), FRIEND_LISTS_TTL_SECONDS)
+    return Response(content=payload, media_type="application/json")
+
 
 @router.post("/send-request", response_model=FriendshipOut, status_code=status.HTTP_201_CREATED)
 async def send_friend_request(
@@ -41,7 +79,9 @@ async def send_friend_request(
         )
     
     # Check if target user exists
-    result = await db.execute(select(User).where(User.id == request.friend_id))
+    result = await db.execute(
+        select(User).options(raiseload("*")).where(User.id == request.friend_id)
+    )
     target_user = result.scalar_one_or_none()
     if not target_user:
         raise HTTPException(
@@ -61,27 +101,28 @@ async def send_friend_request(
     existing_friendship = result.scalar_one_or_none()
     
     if existing_friendship:
-        if existing_friendship.status == "pending":
+        if existing_friendship.status == FriendshipState.pending:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Friend request already sent or received"
             )
-        elif existing_friendship.status == "accepted":
+        elif existing_friendship.status == FriendshipState.accepted:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Already friends with this user"
             )
-        elif existing_friendship.status == "blocked":
+        elif existing_friendship.status == FriendshipState.blocked:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Cannot send friend request to this user"
             )
         else:
             # If rejected, allow sending new request
-            existing_friendship.status = "pending"
+            existing_friendship.status = FriendshipState.pending
             existing_friendship.user_id = current_user.id
             existing_friendship.friend_id = request.friend_id
             await db.commit()
+            await _forget_friend_lists(current_user.id, request.friend_id)
             await db.refresh(existing_friendship)
             return existing_friendship
     
@@ -89,10 +130,11 @@ async def send_friend_request(
     friendship = Friendship(
         user_id=current_user.id,
         friend_id=request.friend_id,
-        status="pending"
+        status=FriendshipState.pending
     )
     db.add(friendship)
     await db.commit()
+    await _forget_friend_lists(current_user.id, request.friend_id)
     await db.refresh(friendship)
     
     return friendship
@@ -128,15 +170,16 @@ async def respond_to_friend_request(
         )
     
     # Check if request is pending
-    if friendship.status != "pending":
+    if friendship.status != FriendshipState.pending:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Friend request is already {friendship.status}"
+            detail=f"Friend request is already {friendship.status.value}"
         )
     
     # Update status based on action
-    friendship.status = response.action + "ed"  # accept -> accepted, reject -> rejected, block -> blocked
+    friendship.status = RESPONSE_ACTION_STATUS[response.action]
     await db.commit()
+    await _forget_friend_lists(friendship.user_id, friendship.friend_id)
     await db.refresh(friendship)
     
     return friendship
@@ -149,34 +192,30 @@ async def get_received_friend_requests(
 ):
     """
     Get all pending friend requests received by current user
+    
+    Served from the Redis cache when available
     """
+    cache_key = friend_list_keys(current_user.id)[1]
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     result = await db.execute(
-        select(Friendship, User)
-        .join(User, Friendship.user_id == User.id)
+        select(Friendship)
+        .options(joinedload(Friendship.user, innerjoin=True))
         .where(
             and_(
                 Friendship.friend_id == current_user.id,
-                Friendship.status == "pending"
+                Friendship.status == FriendshipState.pending
             )
         )
         .order_by(Friendship.created_at.desc())
     )
     
-    requests = []
-    for friendship, user in result.all():
-        requests.append(FriendWithUser(
-            friendship_id=friendship.id,
-            user_id=user.id,
-            username=user.username,
-            display_name=user.display_name,
-            email=user.email,
-            last_seen_at=user.last_seen_at,
-            is_active=user.is_active,
-            status=friendship.status,
-            created_at=friendship.created_at
-        ))
-    
-    return requests
+    return await _cached_json_response(
+        cache_key,
+        [_friend_with_user(friendship, friendship.user) for friendship in result.scalars()]
+    )
 
 
 @router.get("/requests/sent", response_model=List[FriendWithUser])
@@ -188,32 +227,18 @@ async def get_sent_friend_requests(
     Get all pending friend requests sent by current user
     """
     result = await db.execute(
-        select(Friendship, User)
-        .join(User, Friendship.friend_id == User.id)
+        select(Friendship)
+        .options(joinedload(Friendship.friend, innerjoin=True))
         .where(
             and_(
                 Friendship.user_id == current_user.id,
-                Friendship.status == "pending"
+                Friendship.status == FriendshipState.pending
             )
         )
         .order_by(Friendship.created_at.desc())
     )
     
-    requests = []
-    for friendship, user in result.all():
-        requests.append(FriendWithUser(
-            friendship_id=friendship.id,
-            user_id=user.id,
-            username=user.username,
-            display_name=user.display_name,
-            email=user.email,
-            last_seen_at=user.last_seen_at,
-            is_active=user.is_active,
-            status=friendship.status,
-            created_at=friendship.created_at
-        ))
-    
-    return requests
+    return [_friend_with_user(friendship, friendship.friend) for friendship in result.scalars()]
 
 
 @router.get("/friends", response_model=List[FriendWithUser])
@@ -223,45 +248,57 @@ async def get_friends_list(
 ):
     """
     Get all accepted friends of current user
+    
+    Served from the Redis cache when available
     """
-    # Get friendships where current user is either sender or receiver and status is accepted
-    result = await db.execute(
-        select(Friendship, User)
-        .join(
-            User,
-            or_(
-                and_(Friendship.user_id == current_user.id, Friendship.friend_id == User.id),
-                and_(Friendship.friend_id == current_user.id, Friendship.user_id == User.id)
-            )
+    cache_key = friend_list_keys(current_user.id)[0]
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    # Accepted friendships where current user is either sender or receiver,
+    # with the other side's id picked per row so User is joined on one key
+    friendships = (
+        select(
+            Friendship.id,
+            Friendship.status,
+            Friendship.created_at,
+            case(
+                (Friendship.user_id == current_user.id, Friendship.friend_id),
+                else_=Friendship.user_id
+            ).label("other_id")
         )
         .where(
-            and_(
-                or_(
-                    Friendship.user_id == current_user.id,
-                    Friendship.friend_id == current_user.id
-                ),
-                Friendship.status == "accepted",
-                User.id != current_user.id
-            )
+            or_(
+                Friendship.user_id == current_user.id,
+                Friendship.friend_id == current_user.id
+            ),
+            Friendship.status == FriendshipState.accepted
         )
+        .subquery()
+    )
+    
+    result = await db.execute(
+        select(friendships, User)
+        .join(User, User.id == friendships.c.other_id)
         .order_by(User.display_name)
     )
     
     friends = []
-    for friendship, user in result.all():
+    for friendship_id, status, created_at, _, user in result.all():
         friends.append(FriendWithUser(
-            friendship_id=friendship.id,
+            friendship_id=friendship_id,
             user_id=user.id,
             username=user.username,
             display_name=user.display_name,
             email=user.email,
             last_seen_at=user.last_seen_at,
             is_active=user.is_active,
-            status=friendship.status,
-            created_at=friendship.created_at
+            status=status,
+            created_at=created_at
         ))
     
-    return friends
+    return await _cached_json_response(cache_key, friends)
 
 
 @router.get("/status/{user_id}", response_model=FriendshipStatus)
@@ -293,7 +330,7 @@ async def check_friendship_status(
         )
     
     return FriendshipStatus(
-        are_friends=(friendship.status == "accepted"),
+        are_friends=(friendship.status == FriendshipState.accepted),
         status=friendship.status,
         friendship_id=friendship.id,
         initiated_by=friendship.user_id
@@ -332,6 +369,7 @@ async def remove_friend_or_cancel_request(
     # Delete the friendship
     await db.delete(friendship)
     await db.commit()
+    await _forget_friend_lists(friendship.user_id, friendship.friend_id)
     
     return None
 
@@ -352,10 +390,28 @@ async def search_users_for_friends(
             detail="Search query must be at least 2 characters"
         )
     
-    # Search users by username or display name
+    # Search users by username or display name, with each user's friendship
+    # (in either direction) outer-joined via idx_friendships_pair
     search_pattern = f"%{query}%"
     result = await db.execute(
-        select(User)
+        select(
+            User.id,
+            User.username,
+            User.display_name,
+            User.email,
+            User.last_seen_at,
+            User.is_active,
+            Friendship.id.label("friendship_id"),
+            Friendship.status,
+            Friendship.created_at
+        )
+        .outerjoin(
+            Friendship,
+            Friendship.pair_key() == tuple_(
+                func.least(current_user.id, User.id),
+                func.greatest(current_user.id, User.id)
+            )
+        )
         .where(
             and_(
                 User.id != current_user.id,  # Exclude current user
@@ -367,33 +423,18 @@ async def search_users_for_friends(
         )
         .limit(20)
     )
-    users = result.scalars().all()
     
-    # Get friendship status for each user
-    user_results = []
-    for user in users:
-        # Check friendship status
-        friendship_result = await db.execute(
-            select(Friendship).where(
-                or_(
-                    and_(Friendship.user_id == current_user.id, Friendship.friend_id == user.id),
-                    and_(Friendship.user_id == user.id, Friendship.friend_id == current_user.id)
-                )
-            )
+    return [
+        FriendWithUser(
+            friendship_id=row.friendship_id,
+            user_id=row.id,
+            username=row.username,
+            display_name=row.display_name,
+            email=row.email,
+            last_seen_at=row.last_seen_at,
+            is_active=row.is_active,
+            status=row.status,
+            created_at=row.created_at
         )
-        friendship = friendship_result.scalar_one_or_none()
-        
-        user_results.append(FriendWithUser(
-            friendship_id=friendship.id if friendship else None,
-            user_id=user.id,
-            username=user.username,
-            display_name=user.display_name,
-            email=user.email,
-            last_seen_at=user.last_seen_at,
-            is_active=user.is_active,
-            status=friendship.status if friendship else None,
-            created_at=friendship.created_at if friendship else None
-        ))
-    
-    return user_results
-
+        for row in result.all()
+    ]
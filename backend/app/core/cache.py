@@ -0,0 +1,255 @@
+"""
+Optional Redis cache
+All helpers are no-ops when REDIS_URL is unset or Redis is unreachable,
+so callers always fall back to the database
+"""
+from typing import List, Optional, Set
+import logging
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lazily created shared client
+_redis = None
+
+
+def get_redis():
+    """
+    Get the shared Redis client
+
+    Returns:
+        redis.asyncio.Redis, or None when REDIS_URL is not configured
+    """
+    global _redis
+    if _redis is None and settings.REDIS_URL:
+        import redis.asyncio as redis
+        _redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
+
+
+async def cache_get(key: str) -> Optional[str]:
+    """
+    Get a cached value
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Cached string, or None on miss / when caching is unavailable
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except Exception as e:
+        logger.warning(f"Cache get failed for {key}: {e}")
+        return None
+
+
+async def cache_set(key: str, value: str, ttl: int):
+    """
+    Store a value with an expiry
+
+    Args:
+        key: Cache key
+        value: String value
+        ttl: Time to live in seconds
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        await client.set(key, value, ex=ttl)
+    except Exception as e:
+        logger.warning(f"Cache set failed for {key}: {e}")
+
+
+async def cache_delete(*keys: str):
+    """
+    Remove cached keys
+
+    Args:
+        keys: Cache keys to drop
+    """
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        await client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Cache delete failed for {keys}: {e}")
+
+
+async def cache_sismember(key: str, member: str) -> bool:
+    """
+    Check whether a member is in a cached set
+
+    Args:
+        key: Set key
+        member: Member to look up
+
+    Returns:
+        True on hit; False on miss / when caching is unavailable
+    """
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        return bool(await client.sismember(key, member))
+    except Exception as e:
+        logger.warning(f"Cache sismember failed for {key}: {e}")
+        return False
+
+
+async def cache_smembers(key: str) -> Optional[Set[str]]:
+    """
+    Get all members of a cached set
+
+    Args:
+        key: Set key
+
+    Returns:
+        Set of members, or None on miss / when caching is unavailable
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.smembers(key) or None
+    except Exception as e:
+        logger.warning(f"Cache smembers failed for {key}: {e}")
+        return None
+
+
+# Checked and applied atomically so an invalidation cannot slip in between
+_SADD_IF_UNCHANGED_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('sadd', KEYS[1], unpack(ARGV, 3))
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+async def cache_sadd_if_unchanged(
+    key: str,
+    *members: str,
+    guard_key: str,
+    guard_value: Optional[str],
+    ttl: int
+):
+    """
+    Add members to a cached set unless a guard key changed since it was read
+
+    Lets a value read from the database be written back without resurrecting
+    it after a concurrent invalidation that bumped the guard (see cache_incr)
+
+    Args:
+        key: Set key
+        members: Members to add
+        guard_key: Key whose value must still equal guard_value
+        guard_value: Value of guard_key read before the database (None if unset)
+        ttl: Time to live in seconds
+    """
+    client = get_redis()
+    if client is None or not members:
+        return
+    try:
+        await client.eval(
+            _SADD_IF_UNCHANGED_SCRIPT, 2, key, guard_key, guard_value or "", ttl, *members
+        )
+    except Exception as e:
+        logger.warning(f"Cache guarded sadd failed for {key}: {e}")
+
+
+async def cache_incr(*keys: str, ttl: int):
+    """
+    Increment counters and refresh their expiry
+
+    Args:
+        keys: Counter keys
+        ttl: Time to live in seconds
+    """
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(key)
+                pipe.expire(key, ttl)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Cache incr failed for {keys}: {e}")
+
+
+async def cache_srem(key: str, *members: str):
+    """
+    Remove members from a cached set
+
+    Args:
+        key: Set key
+        members: Members to remove
+    """
+    client = get_redis()
+    if client is None or not members:
+        return
+    try:
+        await client.srem(key, *members)
+    except Exception as e:
+        logger.warning(f"Cache srem failed for {key}: {e}")
+
+
+# Conversation membership is cached positively only: members are added after
+# a database check confirms them, and must be removed whenever they leave.
+# Removals bump the version key first, so a write-back based on a database
+# read from before the removal is rejected (cache_sadd_if_unchanged)
+CONVERSATION_MEMBERS_TTL_SECONDS = 3600
+
+
+def conversation_members_key(conversation_id) -> str:
+    """Cache key for the set of known member ids of a conversation"""
+    return f"conv:{conversation_id}:members"
+
+
+def conversation_members_version_key(conversation_id) -> str:
+    """Cache key for the removal counter guarding a conversation's member set"""
+    return f"conv:{conversation_id}:members:version"
+
+
+# A user's conversation ids, cached as a complete set: any membership change
+# for the user bumps the version key and drops the set, so the next read
+# rebuilds it from the database and a rebuild that raced the change is
+# rejected (cache_sadd_if_unchanged)
+USER_CONVERSATIONS_TTL_SECONDS = 3600
+
+
+def user_conversations_key(user_id) -> str:
+    """Cache key for the set of conversation ids a user participates in"""
+    return f"user:{user_id}:convs"
+
+
+def user_conversations_version_key(user_id) -> str:
+    """Cache key for the change counter guarding a user's conversation set"""
+    return f"user:{user_id}:convs:version"
+
+
+# Serialized friend list / received request responses; the friendship
+# endpoints drop both users' keys whenever a friendship between them changes
+FRIEND_LISTS_TTL_SECONDS = 60
+
+
+def friend_list_keys(user_id) -> List[str]:
+    """Cache keys of a user's friends list and received friend requests"""
+    return [f"friends:{user_id}", f"friend_requests:{user_id}:received"]
@@ -16,6 +16,8 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    # asyncpg prepared statements kept per connection (SQLAlchemy default: 100)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
     
     # Security
     SECRET_KEY: str
@@ -25,6 +27,14 @@ class Settings(BaseSettings):
     # File Upload
     UPLOAD_DIR: str = "/app/uploads"
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    # Internal nginx location aliased to UPLOAD_DIR, e.g. "/_internal_uploads".
+    # When set, downloads are handed to nginx via X-Accel-Redirect (sendfile)
+    # instead of being streamed by the app.
+    FILE_ACCEL_REDIRECT_PREFIX: Optional[str] = None
+    
+    # WebSocket fan-out across workers (in-process only when REDIS_URL is unset)
+    REDIS_URL: Optional[str] = None
+    WS_BROADCAST_CHANNEL: str = "ws:broadcast"
     
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = ["*"]
@@ -5,6 +5,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import defer, raiseload
 from typing import Optional
 
 from ..database import get_db
@@ -40,9 +41,11 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    # Get user from database
+    # Get user from database; the password hash is never needed past login
     result = await db.execute(
-        select(User).where(User.id == user_id)
+        select(User)
+        .options(defer(User.password_hash, raiseload=True), raiseload("*"))
+        .where(User.id == user_id)
     )
     user = result.scalar_one_or_none()
     
@@ -2,6 +2,7 @@
 File utility functions
 """
 import os
+import threading
 import uuid
 import aiofiles
 from pathlib import Path
@@ -48,6 +49,9 @@ ALLOWED_MIME_TYPES = {
     ]
 }
 
+# Per-thread libmagic handles, see _get_magic
+_magic_local = threading.local()
+
 ALLOWED_EXTENSIONS = {
     FileCategory.IMAGE: [".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"],
     FileCategory.DOCUMENT: [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".txt", ".csv"],
@@ -104,6 +108,18 @@ def validate_file_type(filename: str, mime_type: str) -> Tuple[bool, Optional[st
     return True, None, category
 
 
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the size limit of its category"""
+    pass
+
+
+def _file_size_error(category: FileCategory) -> str:
+    """Build the size limit error message for a category"""
+    max_size = MAX_FILE_SIZE.get(category, MAX_FILE_SIZE[FileCategory.OTHER])
+    max_mb = max_size / (1024 * 1024)
+    return f"File size exceeds maximum {max_mb}MB for {category.value} files"
+
+
 def validate_file_size(file_size: int, category: FileCategory) -> Tuple[bool, Optional[str]]:
     """
     Validate file size
@@ -118,8 +134,7 @@ def validate_file_size(file_size: int, category: FileCategory) -> Tuple[bool, Op
     max_size = MAX_FILE_SIZE.get(category, MAX_FILE_SIZE[FileCategory.OTHER])
     
     if file_size > max_size:
-        max_mb = max_size / (1024 * 1024)
-        return False, f"File size exceeds maximum {max_mb}MB for {category.value} files"
+        return False, _file_size_error(category)
     
     return True, None
 
@@ -159,24 +174,63 @@ def get_storage_path(category: FileCategory, filename: str) -> Path:
     return category_dir / filename
 
 
-async def save_upload_file(upload_file, dest_path: Path) -> int:
+async def save_upload_file(
+    upload_file,
+    dest_path: Path,
+    category: Optional[FileCategory] = None
+) -> Tuple[int, str]:
     """
     Save uploaded file to destination
     
+    The MIME type is detected from the first chunk while it is in memory,
+    so the saved file is not read back from disk. The chunk is 1MB, which is
+    as much as libmagic inspects when reading a file itself.
+    
     Args:
         upload_file: FastAPI UploadFile
         dest_path: Destination path
+        category: File category; when given, writing stops as soon as its
+            size limit is exceeded
         
     Returns:
-        File size in bytes
+        Tuple of (file size in bytes, detected MIME type)
+        
+    Raises:
+        FileTooLargeError: Upload exceeded the category limit (partial file is removed)
     """
+    max_size = None
+    if category is not None:
+        max_size = MAX_FILE_SIZE.get(category, MAX_FILE_SIZE[FileCategory.OTHER])
+    
     file_size = 0
+    head = b""
     async with aiofiles.open(dest_path, 'wb') as f:
         while chunk := await upload_file.read(1024 * 1024):  # Read 1MB at a time
-            await f.write(chunk)
+            if not file_size:
+                head = chunk
             file_size += len(chunk)
+            if max_size is not None and file_size > max_size:
+                break
+            await f.write(chunk)
+    
+    if max_size is not None and file_size > max_size:
+        dest_path.unlink(missing_ok=True)
+        raise FileTooLargeError(_file_size_error(category))
     
-    return file_size
+    return file_size, detect_mime_type_from_buffer(head, dest_path)
+
+
+def get_thumbnail_path(image_path: Path) -> Path:
+    """
+    Get the path a thumbnail for the given image is (or will be) stored at
+    
+    Args:
+        image_path: Path to original image
+        
+    Returns:
+        Thumbnail path next to the original
+    """
+    return image_path.parent / (image_path.stem + "_thumb" + image_path.suffix)
 
 
 def generate_thumbnail(image_path: Path, max_size=(300, 300)) -> Optional[Path]:
@@ -201,9 +255,7 @@ def generate_thumbnail(image_path: Path, max_size=(300, 300)) -> Optional[Path]:
             # Generate thumbnail
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
             
-            # Create thumbnail filename
-            thumb_filename = image_path.stem + "_thumb" + image_path.suffix
-            thumb_path = image_path.parent / thumb_filename
+            thumb_path = get_thumbnail_path(image_path)
             
             # Save thumbnail
             img.save(thumb_path, quality=85, optimize=True)
@@ -214,6 +266,19 @@ def generate_thumbnail(image_path: Path, max_size=(300, 300)) -> Optional[Path]:
         return None
 
 
+def _get_magic() -> magic.Magic:
+    """
+    Get this thread's libmagic handle
+    
+    Loading the magic database is expensive, so each thread keeps one
+    handle; handles are not safe to share between threads.
+    """
+    mime = getattr(_magic_local, "mime", None)
+    if mime is None:
+        mime = _magic_local.mime = magic.Magic(mime=True)
+    return mime
+
+
 def detect_mime_type(file_path: Path) -> str:
     """
     Detect MIME type of file using python-magic
@@ -225,22 +290,42 @@ def detect_mime_type(file_path: Path) -> str:
         MIME type string
     """
     try:
-        mime = magic.Magic(mime=True)
-        return mime.from_file(str(file_path))
+        return _get_magic().from_file(str(file_path))
     except:
-        # Fallback to extension-based detection
-        ext = file_path.suffix.lower()
-        mime_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.pdf': 'application/pdf',
-            '.txt': 'text/plain',
-            '.mp3': 'audio/mpeg',
-            '.mp4': 'video/mp4',
-        }
-        return mime_map.get(ext, 'application/octet-stream')
+        return _mime_type_from_extension(file_path)
+
+
+def detect_mime_type_from_buffer(buffer: bytes, file_path: Path) -> str:
+    """
+    Detect MIME type from the leading bytes of a file using python-magic
+    
+    Args:
+        buffer: Leading bytes of the file content
+        file_path: Path or name of the file, used for the extension fallback
+        
+    Returns:
+        MIME type string
+    """
+    try:
+        return _get_magic().from_buffer(buffer)
+    except:
+        return _mime_type_from_extension(file_path)
+
+
+def _mime_type_from_extension(file_path: Path) -> str:
+    """Fallback extension-based MIME detection when libmagic is unavailable"""
+    ext = file_path.suffix.lower()
+    mime_map = {
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.png': 'image/png',
+        '.gif': 'image/gif',
+        '.pdf': 'application/pdf',
+        '.txt': 'text/plain',
+        '.mp3': 'audio/mpeg',
+        '.mp4': 'video/mp4',
+    }
+    return mime_map.get(ext, 'application/octet-stream')
 
 
 def init_upload_directories():
@@ -257,3 +342,30 @@ def init_upload_directories():
     
     print(f"✅ Upload directories initialized at {UPLOAD_DIR}")
 
+
+def remove_orphan_thumbnails() -> int:
+    """
+    Delete image thumbnails whose original file no longer exists
+    
+    Cleans up thumbnails left behind when delete_file derived the thumbnail
+    name incorrectly for filenames with several dots. Run once with:
+    python -c "from app.core.file_utils import remove_orphan_thumbnails; remove_orphan_thumbnails()"
+    
+    Returns:
+        Number of thumbnails removed
+    """
+    images_dir = UPLOAD_DIR / (FileCategory.IMAGE.value + "s")
+    if not images_dir.exists():
+        return 0
+    
+    removed = 0
+    for thumb_path in images_dir.glob("*_thumb.*"):
+        if not thumb_path.stem.endswith("_thumb"):
+            continue
+        original = thumb_path.with_name(thumb_path.stem[:-len("_thumb")] + thumb_path.suffix)
+        if not original.exists():
+            thumb_path.unlink(missing_ok=True)
+            removed += 1
+    
+    print(f"🧹 Removed {removed} orphan thumbnails from {images_dir}")
+    return removed
@@ -1,8 +1,10 @@
 """
 Security utilities: password hashing, JWT tokens
 """
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
@@ -10,6 +12,10 @@ from .config import settings
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified token payloads, least recently used first (see decode_access_token)
+TOKEN_CACHE_SIZE = 10000
+_token_cache: "OrderedDict[str, dict]" = OrderedDict()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -49,15 +55,32 @@ def decode_access_token(token: str) -> Optional[dict]:
     """
     Decode and verify JWT token
     
+    Verified payloads are kept in a bounded in-process cache until their
+    exp, so repeated requests and WebSocket reconnects with the same token
+    skip signature verification. Only successfully verified tokens are
+    cached; anything else is always checked in full.
+    
     Args:
         token: JWT token string
         
     Returns:
         Decoded token payload or None if invalid
     """
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            _token_cache.move_to_end(token)
+            return payload
+        del _token_cache[token]
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    
+    if isinstance(payload.get("exp"), (int, float)):
+        _token_cache[token] = payload
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
 
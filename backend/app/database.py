@@ -1,13 +1,17 @@
 """
 Database connection and session management
 """
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from .core.config import settings
 from .models.base import Base
 
-# Create async engine
+# Create async engine; the asyncpg dialect reads its prepared statement
+# cache size from the URL, so every app query is parsed once per connection
 engine = create_async_engine(
-    settings.DATABASE_URL,
+    make_url(settings.DATABASE_URL).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)}
+    ),
     echo=settings.DEBUG,
     future=True,
     pool_pre_ping=True,
@@ -10,6 +10,8 @@ from .core.config import settings
 from .database import init_db, close_db
 from .api.router import api_router
 from .core.file_utils import init_upload_directories
+from .core.cache import close_redis
+from .websocket import manager
 
 
 @asynccontextmanager
@@ -30,10 +32,21 @@ async def lifespan(app: FastAPI):
     # Note: In production, use Alembic migrations instead
     await init_db()  # Auto-create tables from models
     
+    # Share WebSocket broadcasts with other workers through Redis
+    broker = None
+    if settings.REDIS_URL:
+        from .websocket.broker import RedisBroker
+        broker = RedisBroker(settings.REDIS_URL, settings.WS_BROADCAST_CHANNEL, manager.handle_remote)
+        await broker.start()
+        manager.attach_broker(broker)
+    
     yield
     
     # Shutdown
     print("👋 Backend server shutting down...")
+    if broker:
+        await broker.stop()
+    await close_redis()
     await close_db()
 
 
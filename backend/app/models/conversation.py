@@ -1,7 +1,7 @@
 """
 Conversation and ConversationParticipant models
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -53,6 +53,10 @@ class Conversation(Base):
         cascade="all, delete-orphan"
     )
     
+    # Fetch server-generated created_at/updated_at via RETURNING on flush,
+    # so responses can be built without reloading the row
+    __mapper_args__ = {"eager_defaults": True}
+    
     def __repr__(self):
         return f"<Conversation {self.type.value} {self.id}>"
 
@@ -89,6 +93,12 @@ class ConversationParticipant(Base):
     user = relationship("User", back_populates="conversation_participants")
     last_read_message = relationship("Message", foreign_keys=[last_read_message_id])
     
+    # (conversation_id, user_id) is covered by the primary key; this is the
+    # reverse order for "conversations of a user" lookups
+    __table_args__ = (
+        Index("idx_participants_user_conversation", "user_id", "conversation_id"),
+    )
+    
     def __repr__(self):
         return f"<Participant user={self.user_id} conv={self.conversation_id}>"
 
@@ -3,14 +3,24 @@ Friendship Model
 Represents friend relationships between users
 """
 
-from sqlalchemy import Column, String, DateTime, CheckConstraint, UniqueConstraint, Index
+from sqlalchemy import Column, DateTime, CheckConstraint, UniqueConstraint, Index, Enum as SQLEnum, text, tuple_
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 import uuid
+import enum
 
 from .base import Base
 
 
+class FriendshipState(str, enum.Enum):
+    """Friendship status enum"""
+    pending = "pending"
+    accepted = "accepted"
+    rejected = "rejected"
+    blocked = "blocked"
+
+
 class Friendship(Base):
     """
     Friendship model for managing friend relationships
@@ -24,23 +34,66 @@ class Friendship(Base):
     __tablename__ = "friendships"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    friend_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    status = Column(String(20), nullable=False, default="pending", index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    friend_id = Column(UUID(as_uuid=True), nullable=False)
+    status = Column(
+        SQLEnum(FriendshipState, name="friendship_status"),
+        nullable=False,
+        default=FriendshipState.pending,
+        server_default=FriendshipState.pending.value
+    )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    # Relationships (no FK constraints on these columns, so the join is
+    # spelled out); lazy="raise" forces callers to load them explicitly
+    user = relationship(
+        "User",
+        primaryjoin="foreign(Friendship.user_id) == User.id",
+        lazy="raise",
+        viewonly=True
+    )
+    friend = relationship(
+        "User",
+        primaryjoin="foreign(Friendship.friend_id) == User.id",
+        lazy="raise",
+        viewonly=True
+    )
+    
     __table_args__ = (
         CheckConstraint("user_id != friend_id", name="check_not_self"),
-        CheckConstraint(
-            "status IN ('pending', 'accepted', 'rejected', 'blocked')",
-            name="check_valid_status"
-        ),
         UniqueConstraint("user_id", "friend_id", name="unique_friendship"),
+        # Also serve plain user_id / friend_id lookups via their prefix
         Index("idx_friendships_user_status", "user_id", "status"),
         Index("idx_friendships_friend_status", "friend_id", "status"),
+        # Direction-independent lookup, see Friendship.between()
+        Index(
+            "idx_friendships_pair",
+            text("LEAST(user_id, friend_id)"),
+            text("GREATEST(user_id, friend_id)")
+        ),
     )
     
+    @classmethod
+    def pair_key(cls):
+        """Direction-independent (low, high) key of the friendship's two users"""
+        return tuple_(func.least(cls.user_id, cls.friend_id), func.greatest(cls.user_id, cls.friend_id))
+    
+    @classmethod
+    def between(cls, user_id, other_ids):
+        """
+        Filter for friendships between user_id and one or more other users,
+        regardless of who sent the request
+        
+        Uses a single probe on idx_friendships_pair instead of OR-ing both
+        directions. Python UUID ordering matches PostgreSQL's, so the
+        (low, high) pairs can be computed client-side.
+        """
+        if not isinstance(other_ids, (list, tuple, set, frozenset)):
+            other_ids = [other_ids]
+        pairs = [tuple(sorted((user_id, other_id))) for other_id in other_ids]
+        return cls.pair_key().in_(pairs)
+    
     def __repr__(self):
         return f"<Friendship {self.user_id} -> {self.friend_id} ({self.status})>"
 
@@ -1,7 +1,7 @@
 """
 Message model
 """
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, Index, false
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -43,7 +43,7 @@ class Message(Base):
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     edited_at = Column(DateTime(timezone=True), nullable=True)
-    is_deleted = Column(String(10), default="false", nullable=False)  # "false" or "true" for soft delete
+    is_deleted = Column(Boolean, default=False, server_default=false(), nullable=False)  # Soft delete flag
     
     # Read Receipts (for 1-1 chat)
     delivered_at = Column(DateTime(timezone=True), nullable=True)
@@ -60,6 +60,16 @@ class Message(Base):
     reactions = relationship("MessageReaction", back_populates="message", cascade="all, delete-orphan")
     read_by_user = relationship("User", foreign_keys=[read_by_user_id])
     
+    # Newest-first keyset paging within a conversation; id breaks created_at ties
+    __table_args__ = (
+        Index(
+            "idx_messages_conversation_created_id",
+            conversation_id,
+            created_at.desc(),
+            id.desc()
+        ),
+    )
+    
     def __repr__(self):
         return f"<Message {self.id} from {self.sender_id}>"
 
@@ -1,7 +1,7 @@
 """
 Message Reaction model
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -22,8 +22,7 @@ class MessageReaction(Base):
     message_id = Column(
         UUID(as_uuid=True),
         ForeignKey("messages.id", ondelete="CASCADE"),
-        nullable=False,
-        index=True
+        nullable=False
     )
     user_id = Column(
         UUID(as_uuid=True),
@@ -33,7 +32,7 @@ class MessageReaction(Base):
     )
     
     # Reaction data
-    emoji = Column(String(10), nullable=False, index=True)
+    emoji = Column(String(10), nullable=False)
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -42,6 +41,18 @@ class MessageReaction(Base):
     message = relationship("Message", back_populates="reactions")
     user = relationship("User", foreign_keys=[user_id])
     
+    # One user can only react with the same emoji once per message;
+    # add_reaction upserts against this
+    __table_args__ = (
+        UniqueConstraint("message_id", "user_id", "emoji", name="uq_reactions_message_user_emoji"),
+        # Index-only scans for the per-message aggregate in get_message_reactions
+        Index(
+            "idx_reactions_message_covering",
+            "message_id",
+            postgresql_include=["emoji", "user_id", "created_at"]
+        ),
+    )
+    
     def __repr__(self):
         return f"<MessageReaction {self.emoji} by {self.user_id} on {self.message_id}>"
 
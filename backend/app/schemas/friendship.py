@@ -5,6 +5,15 @@ Friendship Schemas for API validation
 from pydantic import BaseModel, UUID4, Field
 from datetime import datetime
 from typing import Literal, Optional
+from enum import Enum
+
+
+class FriendshipState(str, Enum):
+    """Friendship status enum"""
+    pending = "pending"
+    accepted = "accepted"
+    rejected = "rejected"
+    blocked = "blocked"
 
 
 class FriendshipBase(BaseModel):
@@ -28,7 +37,7 @@ class FriendshipOut(BaseModel):
     id: UUID4
     user_id: UUID4
     friend_id: UUID4
-    status: Literal["pending", "accepted", "rejected", "blocked"]
+    status: FriendshipState
     created_at: datetime
     updated_at: datetime
     
@@ -45,7 +54,7 @@ class FriendWithUser(BaseModel):
     email: str
     last_seen_at: Optional[datetime]
     is_active: bool
-    status: Optional[Literal["pending", "accepted", "rejected", "blocked"]] = None  # None if not friends
+    status: Optional[FriendshipState] = None  # None if not friends
     created_at: Optional[datetime] = None  # None if not friends yet
     
     class Config:
@@ -55,7 +64,7 @@ class FriendWithUser(BaseModel):
 class FriendshipStatus(BaseModel):
     """Schema for checking friendship status between two users"""
     are_friends: bool
-    status: Optional[Literal["pending", "accepted", "rejected", "blocked"]]
+    status: Optional[FriendshipState]
     friendship_id: Optional[UUID4]
     initiated_by: Optional[UUID4]  # Who sent the friend request
 
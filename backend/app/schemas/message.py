@@ -38,7 +38,7 @@ class MessageResponse(MessageBase):
     file_name: Optional[str] = None
     created_at: datetime
     edited_at: Optional[datetime] = None
-    is_deleted: str = "false"
+    is_deleted: bool = False
     
     # Read Receipts
     delivered_at: Optional[datetime] = None
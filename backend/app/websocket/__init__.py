@@ -1,10 +1,7 @@
 """
 WebSocket module for real-time messaging
 """
-from .manager import ConnectionManager
-
-# Singleton instance
-manager = ConnectionManager()
+from .manager import ConnectionManager, manager
 
 __all__ = ["manager", "ConnectionManager"]
 
@@ -0,0 +1,138 @@
+"""
+Redis pub/sub broker for WebSocket fan-out across workers
+Each worker only holds its own sockets; broadcasts are published here so
+every worker can deliver them to the users connected to it
+"""
+from typing import Awaitable, Callable, Optional, Set
+import asyncio
+import logging
+import uuid
+import orjson
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBroker:
+    """
+    Publishes broadcast envelopes to a Redis channel and hands envelopes
+    published by other workers to a local handler
+
+    Attributes:
+        worker_id: Random id used to skip envelopes this worker published itself
+    """
+    
+    # Publishes are awaited on request paths, so they must fail fast
+    PUBLISH_TIMEOUT_SECONDS = 2
+    # Idle subscriptions are PINGed so a dead connection is noticed
+    HEALTH_CHECK_INTERVAL_SECONDS = 30
+    # Resubscribe backoff after the subscription connection drops
+    RECONNECT_DELAY_SECONDS = 1
+    MAX_RECONNECT_DELAY_SECONDS = 30
+
+    def __init__(
+        self,
+        url: str,
+        channel: str,
+        on_message: Callable[[dict], Awaitable[None]]
+    ):
+        self.url = url
+        self.channel = channel
+        self.on_message = on_message
+        self.worker_id = uuid.uuid4().hex
+
+        self._redis: Optional[redis.Redis] = None
+        self._sub_redis: Optional[redis.Redis] = None
+        self._listener: Optional[asyncio.Task] = None
+        # Keep references to fire-and-forget publishes until they finish
+        self._pending: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Connect to Redis and start consuming the broadcast channel"""
+        self._redis = redis.from_url(
+            self.url,
+            socket_timeout=self.PUBLISH_TIMEOUT_SECONDS,
+            socket_connect_timeout=self.PUBLISH_TIMEOUT_SECONDS,
+            health_check_interval=self.HEALTH_CHECK_INTERVAL_SECONDS
+        )
+        # Separate client without socket_timeout: a blocking pub/sub read
+        # would otherwise time out whenever the channel is idle
+        self._sub_redis = redis.from_url(
+            self.url,
+            socket_connect_timeout=self.PUBLISH_TIMEOUT_SECONDS,
+            health_check_interval=self.HEALTH_CHECK_INTERVAL_SECONDS
+        )
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop consuming and close the Redis connections"""
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._sub_redis:
+            await self._sub_redis.close()
+        if self._redis:
+            await self._redis.close()
+
+    async def publish(self, envelope: dict):
+        """
+        Publish an envelope to all other workers
+
+        Args:
+            envelope: JSON-serializable dict understood by the manager
+        """
+        envelope["origin"] = self.worker_id
+        try:
+            await self._redis.publish(self.channel, orjson.dumps(envelope))
+        except Exception as e:
+            logger.error(f"❌ Error publishing to {self.channel}: {e}")
+
+    def publish_nowait(self, envelope: dict):
+        """
+        Schedule a publish from synchronous code
+
+        Args:
+            envelope: JSON-serializable dict understood by the manager
+        """
+        task = asyncio.create_task(self.publish(envelope))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _listen(self):
+        """Keep the subscription alive, resubscribing with backoff when it drops"""
+        delay = self.RECONNECT_DELAY_SECONDS
+        while True:
+            pubsub = self._sub_redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"WebSocket broker subscribed to {self.channel} (worker {self.worker_id})")
+                delay = self.RECONNECT_DELAY_SECONDS
+                await self._consume(pubsub)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"❌ Broker subscription to {self.channel} lost: {e}; "
+                    f"resubscribing in {delay}s"
+                )
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_RECONNECT_DELAY_SECONDS)
+
+    async def _consume(self, pubsub):
+        """Dispatch envelopes published by other workers"""
+        async for message in pubsub.listen():
+            try:
+                envelope = orjson.loads(message["data"])
+                if envelope.get("origin") == self.worker_id:
+                    continue
+                await self.on_message(envelope)
+            except Exception as e:
+                logger.error(f"❌ Error handling broker message: {e}")
@@ -3,10 +3,13 @@ WebSocket Connection Manager
 Manages all active WebSocket connections and message broadcasting
 """
 from fastapi import WebSocket
-from typing import Dict, List, Set
+from typing import Dict, Iterable, List, Optional, Set
 from uuid import UUID
-import json
+import asyncio
 import logging
+import time
+import traceback
+import orjson
 from datetime import datetime
 
 from ..schemas.websocket import WSMessage, WSMessageType
@@ -18,18 +21,92 @@ class ConnectionManager:
     """
     Manages WebSocket connections for real-time messaging
     
+    Outgoing frames go through a per-connection queue drained by a writer task.
+    Frames queued within COALESCE_WINDOW of each other are sent as one
+    {"batch": [...]} frame, so bursts cost one socket write instead of many.
+    Queues are bounded: a client that falls QUEUE_MAXSIZE frames behind is
+    disconnected instead of buffering without limit.
+    
+    Frames are encoded once to UTF-8 JSON bytes. Clients that offer the
+    BINARY_SUBPROTOCOL get them as-is via send_bytes; others get text frames.
+    
     Attributes:
         active_connections: Dict mapping user_id to WebSocket connection
         user_conversations: Dict mapping user_id to set of conversation_ids they're in
+        broker: Optional RedisBroker; when attached, broadcasts and membership
+            changes are also published so other workers deliver to their sockets
     """
     
+    # Seconds a writer waits for more frames before flushing a batch
+    COALESCE_WINDOW = 0.005
+    
+    # Frames a connection may have pending before it is dropped as too slow
+    QUEUE_MAXSIZE = 256
+    
+    # Seconds an event timestamp string is reused before it is regenerated
+    TIMESTAMP_RESOLUTION = 0.01
+    
+    # Subprotocol a client offers to receive JSON frames as binary messages
+    BINARY_SUBPROTOCOL = "chat.binary"
+    
     def __init__(self):
         # Store active connections: {user_id: websocket}
         self.active_connections: Dict[UUID, WebSocket] = {}
         
+        # Outgoing frame queue and writer task per connection
+        self._queues: Dict[UUID, asyncio.Queue] = {}
+        self._writers: Dict[UUID, asyncio.Task] = {}
+        
         # Store user's conversations for efficient broadcasting
         # {user_id: {conversation_id1, conversation_id2, ...}}
         self.user_conversations: Dict[UUID, Set[UUID]] = {}
+        
+        # Cross-worker fan-out (see attach_broker)
+        self.broker = None
+        
+        # Cached ISO timestamp for events built without one (see _now_iso)
+        self._timestamp_iso = ""
+        self._timestamp_expires = 0.0
+    
+    def attach_broker(self, broker):
+        """
+        Publish broadcasts through a broker so other workers deliver them too
+        
+        Args:
+            broker: RedisBroker whose on_message is handle_remote
+        """
+        self.broker = broker
+    
+    async def handle_remote(self, envelope: dict):
+        """
+        Deliver an envelope published by another worker to local sockets
+        
+        Args:
+            envelope: Dict produced by one of the broadcast methods
+        """
+        op = envelope["op"]
+        raw = envelope["raw"].encode() if "raw" in envelope else None
+        exclude_user_id = UUID(envelope["exclude_user_id"]) if envelope.get("exclude_user_id") else None
+        
+        if op == "conversation":
+            await self._deliver_to_conversation(
+                raw, UUID(envelope["conversation_id"]), exclude_user_id
+            )
+        elif op == "conversations":
+            await self._deliver_to_conversations(
+                raw, {UUID(c) for c in envelope["conversation_ids"]}, exclude_user_id
+            )
+        elif op == "users":
+            await self._deliver_to_users(raw, [UUID(u) for u in envelope["user_ids"]])
+        elif op == "all":
+            await self._deliver_to_all(raw, exclude_user_id)
+        elif op in ("join", "leave"):
+            update = self._track_conversation if op == "join" else self._untrack_conversation
+            conversation_ids = [UUID(c) for c in envelope["conversation_ids"]]
+            for user_id in envelope["user_ids"]:
+                user_id = UUID(user_id)
+                for conversation_id in conversation_ids:
+                    update(user_id, conversation_id)
     
     async def connect(self, websocket: WebSocket, user_id: UUID):
         """
@@ -39,7 +116,8 @@ class ConnectionManager:
             websocket: The WebSocket connection
             user_id: The user's UUID
         """
-        await websocket.accept()
+        binary = self.BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+        await websocket.accept(subprotocol=self.BINARY_SUBPROTOCOL if binary else None)
         
         # If user already has a connection, close the old one
         if user_id in self.active_connections:
@@ -51,6 +129,7 @@ class ConnectionManager:
         
         # Store new connection
         self.active_connections[user_id] = websocket
+        self._start_writer(user_id, websocket, binary)
         
         logger.info(f"User {user_id} connected. Total connections: {len(self.active_connections)}")
     
@@ -65,10 +144,56 @@ class ConnectionManager:
             del self.active_connections[user_id]
             logger.info(f"User {user_id} disconnected. Total connections: {len(self.active_connections)}")
         
+        self._queues.pop(user_id, None)
+        writer = self._writers.pop(user_id, None)
+        if writer and writer is not asyncio.current_task():
+            writer.cancel()
+        
         # Clean up conversation tracking
         if user_id in self.user_conversations:
             del self.user_conversations[user_id]
     
+    def _start_writer(self, user_id: UUID, websocket: WebSocket, binary: bool):
+        """Create the frame queue and writer task for a new connection"""
+        old_writer = self._writers.pop(user_id, None)
+        if old_writer:
+            old_writer.cancel()
+        
+        queue = asyncio.Queue(maxsize=self.QUEUE_MAXSIZE)
+        self._queues[user_id] = queue
+        self._writers[user_id] = asyncio.create_task(self._writer(user_id, websocket, queue, binary))
+    
+    async def _writer(self, user_id: UUID, websocket: WebSocket, queue: asyncio.Queue, binary: bool):
+        """
+        Drain a connection's queue, coalescing frames that arrive close together
+        
+        A lone frame is sent unchanged; several are joined into one
+        {"batch": [...]} frame without re-encoding them.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.COALESCE_WINDOW
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            frame = batch[0] if len(batch) == 1 else b'{"batch":[' + b",".join(batch) + b"]}"
+            try:
+                if binary:
+                    await websocket.send_bytes(frame)
+                else:
+                    await websocket.send_text(frame.decode())
+            except Exception as e:
+                logger.error(f"❌ Error sending message to user {user_id}: {e}")
+                logger.error(traceback.format_exc())
+                # Connection might be broken, remove it (unless already replaced)
+                if self.active_connections.get(user_id) is websocket:
+                    self.disconnect(user_id)
+                return
+    
     def add_user_to_conversation(self, user_id: UUID, conversation_id: UUID):
         """
         Track which conversations a user is part of
@@ -77,9 +202,48 @@ class ConnectionManager:
             user_id: The user's UUID
             conversation_id: The conversation's UUID
         """
-        if user_id not in self.user_conversations:
-            self.user_conversations[user_id] = set()
-        self.user_conversations[user_id].add(conversation_id)
+        self._track_conversation(user_id, conversation_id)
+        
+        # The user's socket may live on another worker
+        if self.broker and user_id not in self.active_connections:
+            self._publish_membership("join", [user_id], [conversation_id])
+    
+    def add_user_to_conversations(self, user_id: UUID, conversation_ids: Iterable[UUID]):
+        """
+        Track several conversations for a user at once
+        
+        Used when a user connects to register every conversation they are in
+        with a single set update.
+        
+        Args:
+            user_id: The user's UUID
+            conversation_ids: The conversations' UUIDs
+        """
+        conversation_ids = set(conversation_ids)
+        if user_id in self.active_connections:
+            self.user_conversations.setdefault(user_id, set()).update(conversation_ids)
+        elif self.broker and conversation_ids:
+            self._publish_membership("join", [user_id], conversation_ids)
+    
+    def add_users_to_conversation(self, user_ids: Iterable[UUID], conversation_id: UUID):
+        """
+        Track a conversation for several users at once
+        
+        Users connected to other workers are announced in one broker envelope
+        instead of one per user.
+        
+        Args:
+            user_ids: The users' UUIDs
+            conversation_id: The conversation's UUID
+        """
+        remote_user_ids = []
+        for user_id in user_ids:
+            self._track_conversation(user_id, conversation_id)
+            if user_id not in self.active_connections:
+                remote_user_ids.append(user_id)
+        
+        if self.broker and remote_user_ids:
+            self._publish_membership("join", remote_user_ids, [conversation_id])
     
     def remove_user_from_conversation(self, user_id: UUID, conversation_id: UUID):
         """
@@ -89,9 +253,110 @@ class ConnectionManager:
             user_id: The user's UUID
             conversation_id: The conversation's UUID
         """
+        self._untrack_conversation(user_id, conversation_id)
+        
+        if self.broker and user_id not in self.active_connections:
+            self._publish_membership("leave", [user_id], [conversation_id])
+    
+    def _publish_membership(self, op: str, user_ids: Iterable[UUID], conversation_ids: Iterable[UUID]):
+        """Tell other workers that every given user joined/left every given conversation"""
+        self.broker.publish_nowait({
+            "op": op,
+            "user_ids": [str(user_id) for user_id in user_ids],
+            "conversation_ids": [str(conversation_id) for conversation_id in conversation_ids]
+        })
+    
+    def _track_conversation(self, user_id: UUID, conversation_id: UUID):
+        """
+        Record conversation membership on this worker only
+        
+        Only users connected here are tracked: disconnect() is what clears
+        the entry, and a user who connects later loads every membership in
+        load_user_conversations anyway.
+        """
+        if user_id not in self.active_connections:
+            return
+        if user_id not in self.user_conversations:
+            self.user_conversations[user_id] = set()
+        self.user_conversations[user_id].add(conversation_id)
+    
+    def _untrack_conversation(self, user_id: UUID, conversation_id: UUID):
+        """Forget conversation membership on this worker only"""
         if user_id in self.user_conversations:
             self.user_conversations[user_id].discard(conversation_id)
     
+    def _now_iso(self) -> str:
+        """
+        Current UTC time as an ISO string, regenerated at most every
+        TIMESTAMP_RESOLUTION seconds so bursts of events share one
+        """
+        now = time.monotonic()
+        if now >= self._timestamp_expires:
+            self._timestamp_iso = datetime.utcnow().isoformat()
+            self._timestamp_expires = now + self.TIMESTAMP_RESOLUTION
+        return self._timestamp_iso
+    
+    def encode(self, message: WSMessage) -> bytes:
+        """
+        Serialize a message to a UTF-8 JSON frame
+        
+        orjson handles UUID/datetime/enum values natively, so the fields are
+        handed to it directly instead of going through a pydantic dump; callers
+        build data with plain model_dump() (python mode). Messages without a
+        timestamp get the cached one from _now_iso().
+        
+        Args:
+            message: The WebSocket message to encode
+            
+        Returns:
+            JSON bytes ready to be queued with send_raw
+        """
+        return orjson.dumps({
+            "type": message.type,
+            "data": message.data,
+            "timestamp": message.timestamp or self._now_iso()
+        })
+    
+    async def send_raw(self, raw: bytes, user_id: UUID) -> bool:
+        """
+        Queue an already encoded frame for a specific user
+        
+        Args:
+            raw: JSON bytes produced by encode()
+            user_id: The target user's UUID
+            
+        Returns:
+            True if the frame was queued, False if the user is not connected
+        """
+        queue = self._queues.get(user_id)
+        if queue is None:
+            logger.warning(f"⚠️ User {user_id} not connected, cannot send message")
+            return False
+        
+        try:
+            queue.put_nowait(raw)
+        except asyncio.QueueFull:
+            logger.warning(f"⚠️ User {user_id} is not keeping up, dropping connection")
+            self._drop_slow_connection(user_id)
+            return False
+        return True
+    
+    def _drop_slow_connection(self, user_id: UUID):
+        """Disconnect a client whose queue is full and close its socket"""
+        websocket = self.active_connections.get(user_id)
+        self.disconnect(user_id)
+        if websocket is not None:
+            # 1013: try again later; the client reconnects and resyncs
+            asyncio.create_task(self._close_quietly(websocket, 1013, "Client too slow"))
+    
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int, reason: str):
+        """Close a socket, ignoring errors from an already broken connection"""
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+    
     async def send_personal_message(self, message: WSMessage, user_id: UUID):
         """
         Send a message to a specific user
@@ -101,21 +366,14 @@ class ConnectionManager:
             user_id: The target user's UUID
         """
         if user_id in self.active_connections:
-            websocket = self.active_connections[user_id]
-            try:
-                # Add timestamp if not present
-                if not message.timestamp:
-                    message.timestamp = datetime.utcnow()
-                
-                message_dict = message.model_dump(mode='json')
-                await websocket.send_json(message_dict)
-                logger.info(f"✅ Sent message to user {user_id}: {message.type}")
-            except Exception as e:
-                logger.error(f"❌ Error sending message to user {user_id}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-                # Connection might be broken, remove it
-                self.disconnect(user_id)
+            if await self.send_raw(self.encode(message), user_id):
+                logger.info(f"✅ Queued message for user {user_id}: {message.type}")
+        elif self.broker:
+            await self.broker.publish({
+                "op": "users",
+                "user_ids": [str(user_id)],
+                "raw": self.encode(message).decode()
+            })
         else:
             logger.warning(f"⚠️ User {user_id} not connected, cannot send {message.type} message")
     
@@ -133,6 +391,20 @@ class ConnectionManager:
             conversation_id: The conversation's UUID
             exclude_user_id: Optional user_id to exclude from broadcast (e.g., the sender)
         """
+        # Encode once, send the same frame to all target users
+        raw = self.encode(message)
+        await self._deliver_to_conversation(raw, conversation_id, exclude_user_id)
+        
+        if self.broker:
+            await self.broker.publish({
+                "op": "conversation",
+                "conversation_id": str(conversation_id),
+                "exclude_user_id": str(exclude_user_id) if exclude_user_id else None,
+                "raw": raw.decode()
+            })
+    
+    async def _deliver_to_conversation(self, raw: bytes, conversation_id: UUID, exclude_user_id: Optional[UUID]):
+        """Send a frame to conversation members connected to this worker"""
         # Find all users in this conversation who are online
         target_users = [
             user_id 
@@ -142,20 +414,89 @@ class ConnectionManager:
         
         logger.debug(f"Broadcasting to conversation {conversation_id}: {len(target_users)} users")
         
-        # Send to all target users
         for user_id in target_users:
-            await self.send_personal_message(message, user_id)
+            await self.send_raw(raw, user_id)
     
-    async def broadcast_to_users(self, message: WSMessage, user_ids: List[UUID]):
+    async def broadcast_to_conversations(
+        self,
+        message: WSMessage,
+        conversation_ids: Iterable[UUID],
+        exclude_user_id: UUID = None
+    ):
+        """
+        Broadcast a message once to everyone sharing any of the conversations
+        
+        Users in several of the conversations still receive a single frame.
+        
+        Args:
+            message: The WebSocket message to send
+            conversation_ids: The conversations' UUIDs
+            exclude_user_id: Optional user_id to exclude from broadcast
+        """
+        conversation_ids = set(conversation_ids)
+        if not conversation_ids:
+            return
+        
+        raw = self.encode(message)
+        await self._deliver_to_conversations(raw, conversation_ids, exclude_user_id)
+        
+        if self.broker:
+            await self.broker.publish({
+                "op": "conversations",
+                "conversation_ids": [str(conversation_id) for conversation_id in conversation_ids],
+                "exclude_user_id": str(exclude_user_id) if exclude_user_id else None,
+                "raw": raw.decode()
+            })
+    
+    async def _deliver_to_conversations(
+        self,
+        raw: bytes,
+        conversation_ids: Set[UUID],
+        exclude_user_id: Optional[UUID]
+    ):
+        """Send a frame to members of any of the conversations connected to this worker"""
+        target_users = [
+            user_id
+            for user_id, conversations in self.user_conversations.items()
+            if user_id != exclude_user_id and not conversations.isdisjoint(conversation_ids)
+        ]
+        
+        for user_id in target_users:
+            await self.send_raw(raw, user_id)
+    
+    async def broadcast_to_users(self, message: WSMessage, user_ids: List[UUID]) -> int:
         """
         Broadcast a message to specific list of users
         
+        The message is encoded once and queued on each user's connection.
+        
         Args:
             message: The WebSocket message to send
             user_ids: List of user UUIDs to send to
+            
+        Returns:
+            Number of users the message was queued for on this worker
         """
+        raw = self.encode(message)
+        sent = await self._deliver_to_users(raw, user_ids)
+        
+        if self.broker:
+            await self.broker.publish({
+                "op": "users",
+                "user_ids": [str(user_id) for user_id in user_ids],
+                "raw": raw.decode()
+            })
+        return sent
+    
+    async def _deliver_to_users(self, raw: bytes, user_ids: List[UUID]) -> int:
+        """Send a frame to the given users connected to this worker"""
+        if self.broker:
+            # Users connected elsewhere are served by their own worker
+            user_ids = [user_id for user_id in user_ids if user_id in self.active_connections]
+        sent = 0
         for user_id in user_ids:
-            await self.send_personal_message(message, user_id)
+            sent += await self.send_raw(raw, user_id)
+        return sent
     
     async def broadcast_to_all(self, message: WSMessage, exclude_user_id: UUID = None):
         """
@@ -165,9 +506,21 @@ class ConnectionManager:
             message: The WebSocket message to send
             exclude_user_id: Optional user_id to exclude from broadcast
         """
+        raw = self.encode(message)
+        await self._deliver_to_all(raw, exclude_user_id)
+        
+        if self.broker:
+            await self.broker.publish({
+                "op": "all",
+                "exclude_user_id": str(exclude_user_id) if exclude_user_id else None,
+                "raw": raw.decode()
+            })
+    
+    async def _deliver_to_all(self, raw: bytes, exclude_user_id: Optional[UUID]):
+        """Send a frame to every user connected to this worker"""
         for user_id in list(self.active_connections.keys()):
             if user_id != exclude_user_id:
-                await self.send_personal_message(message, user_id)
+                await self.send_raw(raw, user_id)
     
     def is_user_online(self, user_id: UUID) -> bool:
         """
@@ -4,14 +4,17 @@
 -- Add edited_at and is_deleted columns to messages table
 ALTER TABLE messages 
 ADD COLUMN IF NOT EXISTS edited_at TIMESTAMP WITH TIME ZONE NULL,
-ADD COLUMN IF NOT EXISTS is_deleted VARCHAR(10) DEFAULT 'false' NOT NULL;
+ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT FALSE NOT NULL;
 
--- Create index for faster queries on non-deleted messages
-CREATE INDEX IF NOT EXISTS idx_messages_is_deleted ON messages(is_deleted);
+-- Create partial index for faster queries on non-deleted messages
+-- (same definition as the Alembic migration)
+CREATE INDEX IF NOT EXISTS idx_messages_active
+ON messages(conversation_id, created_at DESC)
+WHERE is_deleted = false;
 
 -- Comment for documentation
 COMMENT ON COLUMN messages.edited_at IS 'Timestamp of last edit (NULL if never edited)';
-COMMENT ON COLUMN messages.is_deleted IS 'Soft delete flag: "false" or "true"';
+COMMENT ON COLUMN messages.is_deleted IS 'Soft delete flag';
 
 -- Display confirmation
 SELECT 'Message management fields added successfully!' AS status;
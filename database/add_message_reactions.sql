@@ -14,9 +14,10 @@ CREATE TABLE IF NOT EXISTS message_reactions (
 );
 
 -- Create indexes for faster queries
-CREATE INDEX IF NOT EXISTS idx_reactions_message_id ON message_reactions(message_id);
+-- (lookups by message_id + user_id + emoji use the UNIQUE constraint's index)
+CREATE INDEX IF NOT EXISTS idx_reactions_message_covering
+    ON message_reactions(message_id) INCLUDE (emoji, user_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_reactions_user_id ON message_reactions(user_id);
-CREATE INDEX IF NOT EXISTS idx_reactions_emoji ON message_reactions(emoji);
 
 -- Comments for documentation
 COMMENT ON TABLE message_reactions IS 'Emoji reactions on messages';
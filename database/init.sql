@@ -62,7 +62,7 @@ CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_conversations_created_by ON conversations(created_by);
 CREATE INDEX idx_conversations_updated_at ON conversations(updated_at DESC);
 CREATE INDEX idx_participants_user_id ON conversation_participants(user_id);
-CREATE INDEX idx_messages_conversation_created ON messages(conversation_id, created_at DESC);
+CREATE INDEX idx_messages_conversation_created_id ON messages(conversation_id, created_at DESC, id DESC);
 CREATE INDEX idx_messages_sender ON messages(sender_id);
 
 -- Function to update updated_at timestamp
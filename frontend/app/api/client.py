@@ -193,15 +193,33 @@ class APIClient:
     
     # ==================== Messages ====================
     
-    async def get_messages(self, conversation_id: str, skip: int = 0, limit: int = 50) -> List[Message]:
-        """Get messages from conversation"""
+    async def get_messages(
+        self,
+        conversation_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> List[Message]:
+        """
+        Get messages from conversation
+        
+        Pass before/before_id (created_at and id of the oldest loaded message)
+        to page back through history instead of skip.
+        """
+        params = {
+            "conversation_id": conversation_id,
+            "skip": skip,
+            "limit": limit
+        }
+        if before:
+            params["before"] = before
+            if before_id:
+                params["before_id"] = before_id
+        
         response = await self.client.get(
             f"{self.base_url}/messages/",
-            params={
-                "conversation_id": conversation_id,
-                "skip": skip,
-                "limit": limit
-            },
+            params=params,
             headers=self.get_headers()
         )
         response.raise_for_status()
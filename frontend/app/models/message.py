@@ -21,7 +21,7 @@ class Message:
     file_type: Optional[str] = None
     file_name: Optional[str] = None
     edited_at: Optional[str] = None
-    is_deleted: str = "false"
+    is_deleted: bool = False
     reactions: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)  # {emoji: [users]}
     
     # Read Receipts
@@ -61,7 +61,7 @@ class Message:
             file_type=data.get("file_type"),
             file_name=data.get("file_name"),
             edited_at=data.get("edited_at"),
-            is_deleted=data.get("is_deleted", "false"),
+            is_deleted=data.get("is_deleted") in (True, "true"),
             reactions=data.get("reactions", {}),
             # Read Receipts
             delivered_at=delivered_at,
@@ -85,7 +85,7 @@ class Message:
     
     def is_message_deleted(self) -> bool:
         """Check if message is deleted"""
-        return self.is_deleted == "true"
+        return self.is_deleted
     
     def has_reactions(self) -> bool:
         """Check if message has any reactions"""
@@ -64,7 +64,9 @@ class WebSocketClient:
             self.listen_task = None
             
             logger.info(f"Connecting to WebSocket: {config.WS_ENDPOINT}")
-            self.ws = await websockets.connect(self.url)
+            # Binary frames skip a UTF-8 decode/encode per message on the server;
+            # json.loads below accepts the bytes as-is
+            self.ws = await websockets.connect(self.url, subprotocols=["chat.binary"])
             self.connected = True
             logger.info("✅ WebSocket connected!")
             
@@ -107,20 +109,24 @@ class WebSocketClient:
             while self.connected and self.ws:
                 try:
                     message = await self.ws.recv()
-                    data = json.loads(message)
+                    frame = json.loads(message)
                     
-                    msg_type = data.get('type', 'unknown')
-                    logger.info(f"📥 WebSocket RAW message received: type={msg_type}")
-                    logger.info(f"📥 Full message data: {json.dumps(data, indent=2, default=str)}")
+                    # Server coalesces bursts into {"batch": [event, ...]}
+                    events = frame["batch"] if "batch" in frame else [frame]
                     
-                    # Call all callbacks
-                    for callback in self.message_callbacks:
-                        try:
-                            callback(data)
-                        except Exception as e:
-                            logger.error(f"❌ Error in message callback: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
+                    for data in events:
+                        msg_type = data.get('type', 'unknown')
+                        logger.info(f"📥 WebSocket RAW message received: type={msg_type}")
+                        logger.info(f"📥 Full message data: {json.dumps(data, indent=2, default=str)}")
+                        
+                        # Call all callbacks
+                        for callback in self.message_callbacks:
+                            try:
+                                callback(data)
+                            except Exception as e:
+                                logger.error(f"❌ Error in message callback: {e}")
+                                import traceback
+                                logger.error(traceback.format_exc())
                 
                 except websockets.exceptions.ConnectionClosed:
                     logger.warning("⚠️⚠️⚠️ WebSocket connection closed!")